@@ -1,14 +1,21 @@
 """
 Action executor - performs REAL mouse clicks and keyboard input
-Uses PyAutoGUI for actual desktop automation
+Uses PyAutoGUI for actual desktop automation, with clicks and typing
+batched through SendInput (see fast_input.py)
 """
 import pyautogui
 import time
+import fast_input
 
 # Safety settings
-pyautogui.PAUSE = 0.5
+# No implicit sleep after every pyautogui call - the agent loop does one
+# explicit settle per action instead
+pyautogui.PAUSE = 0
 pyautogui.FAILSAFE = True  # Move mouse to corner to stop
 
+# Time the focused app needs per character to consume batched keystrokes
+TYPING_SETTLE_PER_CHAR = 0.01
+
 def execute_action(action):
     """
     Execute the action that Mistral decided
@@ -23,14 +30,15 @@ def execute_action(action):
             x = action['x']
             y = action['y']
             print(f"   Clicking at ({x}, {y})")
-            pyautogui.click(x, y)
+            fast_input.click(x, y)
             return {"success": True}
         
         elif action_type == 'type':
             # REAL keyboard typing
             text = action['text']
             print(f"   Typing: {text}")
-            pyautogui.write(text, interval=0.05)
+            fast_input.write(text)
+            time.sleep(len(text) * TYPING_SETTLE_PER_CHAR)
             return {"success": True}
         
         elif action_type == 'press_key':
@@ -8,12 +8,77 @@ from PIL import Image, ImageDraw
 import io
 import base64
 import random
+import copy
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import mss
+import httpx
 from mistralai import Mistral
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# No implicit sleep after every pyautogui call - settling is explicit (SETTLE_DELAY)
+pyautogui.PAUSE = 0
+
+# Static system prompt - formatted once per agent so every request sends a
+# byte-identical prefix that the provider's prefix cache can reuse
+_SYSTEM_PROMPT = """\
+You are HyperOS AI, a HUMAN-LIKE desktop agent following the 'Comet Architecture'.
+Current System: {os_type}
+Screen Resolution: {screen_size}
+
+VISUAL CONTEXT:
+The screenshot has a light-cyan coordinate grid overlay [0-1000 scale].
+- Use these grid numbers to calculate PERFECT coordinates for your actions.
+- X-axis (0-1000) is horizontal (left to right).
+- Y-axis (0-1000) is vertical (top to bottom).
+
+GOAL: Complete user tasks using GUI interactions ONLY.
+- DO NOT suggest terminal commands.
+- Perform actions exactly like a human: click Start, click Icons, click Menus.
+
+Respond ONLY in JSON format:
+{{
+  "screen_analysis": {{
+    "description": "What do you see relative to the grid?",
+    "elements": [
+      {{"name": "App Icon", "coords_1000": [x, y], "type": "icon|button|text"}}
+    ]
+  }},
+  "next_action": {{
+    "type": "click" | "type" | "press_key" | "scroll" | "wait" | "done",
+    "target": "element name",
+    "coords_1000": [x, y],
+    "text": "text content",
+    "key": "key name",
+    "reasoning": "Semantic explanation of this human-like step",
+    "expected_outcome": "Visual state change"
+  }}
+}}
+"""
+
 class HyperOSAgent:
+    GRID_STEPS = np.arange(0, 1001, 100)
+    GRID_COLOR = (0, 255, 255, 255)
+
+    # Max screenshot edge sent to Pixtral: full detail for planning, coarse for verification
+    PLAN_MAX_EDGE = 1280
+    VERIFY_MAX_EDGE = 640
+
+    # Decision cache: screens within this many differing dHash bits count as the same
+    RESPONSE_CACHE_SIZE = 256
+    RESPONSE_CACHE_MAX_DISTANCE = 4
+
+    # Verification on a screen this close to the last one sent is answered with a local wait
+    UNCHANGED_SCREEN_MAX_DISTANCE = 2
+
+    SETTLE_DELAY = 1.0  # seconds for the UI to react before the verification frame
+    TYPING_SETTLE_PER_CHAR = 0.01  # per-character time for the app to consume typed text
+    PREFETCH_MAX_AGE = 5.0  # a prefetched planning frame older than this is recaptured
+
     def __init__(self):
         self.os_type = platform.system()
         self.screen_size = pyautogui.size()
@@ -23,10 +88,49 @@ class HyperOSAgent:
         if not mistral_key:
             print("WARNING: MISTRAL_API_KEY not found in .env")
         
-        self.client = Mistral(api_key=mistral_key)
+        # One keep-alive HTTP/2 connection pool for the agent's lifetime,
+        # so each Pixtral call skips the TCP + TLS handshake
+        self._http = httpx.Client(
+            http2=True,
+            timeout=30,
+            limits=httpx.Limits(max_keepalive_connections=4)
+        )
+        self.client = Mistral(api_key=mistral_key, client=self._http)
         self.model_name = 'pixtral-12b-2409' # Using Pixtral for vision capabilities
         self.current_task = None
         self.history = []
+        self.human_motion = False  # animated cursor moves, for demos only
+
+        # Grid coordinate (0-1000) -> screen pixel lookup tables
+        grid = np.arange(1001)
+        self._x_lut = grid * self.screen_size[0] // 1000
+        self._y_lut = grid * self.screen_size[1] // 1000
+        self.system_instructions = _SYSTEM_PROMPT.format(
+            os_type=self.os_type,
+            screen_size=f"{self.screen_size[0]}x{self.screen_size[1]}"
+        )
+        self._grid_overlays = {}
+        self._get_grid_overlay(self._scaled_size(self.screen_size, self.PLAN_MAX_EDGE))
+        self._response_cache = OrderedDict()  # (task, verification context, dhash) -> decision
+        self._last_screen_hash = None  # dhash of the last screenshot actually sent to Pixtral
+
+        # Verification frames are captured + encoded off the request thread
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hyperos-capture")
+        self._input_lock = threading.Lock()  # serializes pyautogui input and capture
+        self._capture_local = threading.local()  # mss handles are per-thread
+        self._pending_frame = None
+        self._next_plan_frame = None  # (captured_at, future) for the next cycle's plan step
+
+    def close(self):
+        """Release the HTTP connection pool and capture workers"""
+        self._http.close()
+        self._pool.shutdown(wait=False)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
 
     def get_system_status(self):
         return {
@@ -36,73 +140,152 @@ class HyperOSAgent:
         }
 
     def capture_screen(self):
-        """STEP 1: ANALYZE (Screen Capture)"""
-        screenshot = pyautogui.screenshot()
+        """STEP 1: ANALYZE (Screen Capture) - raw RGB ndarray straight from mss"""
+        sct = getattr(self._capture_local, "sct", None)
+        if sct is None:
+            sct = self._capture_local.sct = mss.mss()
+        shot = sct.grab(sct.monitors[1])
+        return np.frombuffer(shot.rgb, dtype=np.uint8).reshape(shot.height, shot.width, 3)
+
+    @staticmethod
+    def _as_image(screenshot):
+        """Accept either a PIL Image or an RGB ndarray from capture_screen"""
+        if isinstance(screenshot, np.ndarray):
+            return Image.fromarray(screenshot, "RGB")
         return screenshot
 
-    def encode_image(self, image):
+    @staticmethod
+    def _scaled_size(size, max_edge):
+        """Fit size within max_edge x max_edge, keeping aspect ratio (never upscales)"""
+        w, h = size
+        scale = min(1.0, max_edge / max(w, h))
+        return (max(1, int(w * scale)), max(1, int(h * scale)))
+
+    def encode_image(self, image, max_edge=PLAN_MAX_EDGE):
+        image = self._as_image(image)
+
+        # Downscale first - the grid is on a 0-1000 scale so coordinates are unaffected
+        size = self._scaled_size(image.size, max_edge)
+        if size != image.size:
+            image = image.resize(size, Image.BILINEAR)
+
         # Apply standard Visual Guides (Set-of-Mark style)
-        # This draws a coordinate grid that helps the AI be 100% precise
-        draw = ImageDraw.Draw(image)
-        w, h = image.size
-        
-        # Draw a subtle numbered grid (0-1000 scale)
-        # Vertical lines every 100 units
-        for i in range(0, 1001, 100):
-            x = int(i * w / 1000)
-            draw.line([(x, 0), (x, h)], fill=(0, 255, 255, 50), width=1)
-            draw.text((x + 5, 5), str(i), fill=(0, 255, 255, 150))
-            
-        # Horizontal lines every 100 units
-        for j in range(0, 1001, 100):
-            y = int(j * h / 1000)
-            draw.line([(0, y), (w, y)], fill=(0, 255, 255, 50), width=1)
-            draw.text((5, y + 5), str(j), fill=(0, 255, 255, 150))
-            
+        # This draws a coordinate grid that helps the AI be 100% precise.
+        # The grid is built once per resolution and blitted every frame.
+        image = image.convert("RGBA")
+        image.alpha_composite(self._get_grid_overlay(image.size))
+        image = image.convert("RGB")
+
         buffered = io.BytesIO()
-        image.save(buffered, format="JPEG", quality=85)
+        # 4:2:0 chroma at q75 - UI screenshots are mostly flat color and Pixtral downsamples anyway
+        image.save(buffered, format="JPEG", quality=75, subsampling=2, optimize=False, progressive=False)
         return base64.b64encode(buffered.getvalue()).decode("utf-8")
 
-    def ai_model_analyze_plan_execute(self, user_task, screenshot, is_verification=False, last_action=None):
+    def _get_grid_overlay(self, size):
+        """Transparent overlay holding the numbered grid (0-1000 scale) for a given size"""
+        overlay = self._grid_overlays.get(size)
+        if overlay is None:
+            w, h = size
+            arr = np.zeros((h, w, 4), dtype=np.uint8)
+
+            # Lines every 100 units - two strided writes instead of a draw loop
+            xs = self.GRID_STEPS * w // 1000
+            ys = self.GRID_STEPS * h // 1000
+            arr[:, xs[xs < w]] = self.GRID_COLOR
+            arr[ys[ys < h], :] = self.GRID_COLOR
+
+            overlay = Image.fromarray(arr, "RGBA")
+            draw = ImageDraw.Draw(overlay)
+            for i in self.GRID_STEPS:
+                draw.text((int(i * w / 1000) + 5, 5), str(i), fill=(0, 255, 255, 150))
+                draw.text((5, int(i * h / 1000) + 5), str(i), fill=(0, 255, 255, 150))
+            self._grid_overlays[size] = overlay
+        return overlay
+
+    @classmethod
+    def _dhash(cls, image, hash_size=16):
+        """Difference hash: one bit per horizontally adjacent brightness comparison"""
+        # Shrink first (reducing_gap does a fast integer box-reduce before the
+        # bilinear pass), then convert the tiny result to grayscale
+        small = cls._as_image(image).resize(
+            (hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0
+        ).convert("L")
+        px = np.asarray(small, dtype=np.int16)
+        bits = np.packbits(px[:, 1:] > px[:, :-1])
+        return int.from_bytes(bits.tobytes(), "big")
+
+    def _get_cached_decision(self, context, screen_hash):
+        """Return a cached decision for an identical or near-identical screen"""
+        key = context + (screen_hash,)
+        if key not in self._response_cache:
+            key = next(
+                (k for k in self._response_cache
+                 if k[:-1] == context and (k[-1] ^ screen_hash).bit_count() <= self.RESPONSE_CACHE_MAX_DISTANCE),
+                None
+            )
+            if key is None:
+                return None
+
+        self._response_cache.move_to_end(key)
+        return copy.deepcopy(self._response_cache[key])
+
+    def _cache_decision(self, context, screen_hash, decision):
+        self._response_cache[context + (screen_hash,)] = copy.deepcopy(decision)
+        if len(self._response_cache) > self.RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+
+    def _capture_frame(self, max_edge, settle=0.0):
+        """Optionally wait for the UI to settle, then capture, hash and encode a frame"""
+        if settle:
+            time.sleep(settle)
+        with self._input_lock:
+            screenshot = self.capture_screen()
+        return screenshot, self._dhash(screenshot), self.encode_image(screenshot, max_edge)
+
+    def _take_pending_frame(self):
+        """Collect the frame prepared after the last action (or capture one now)"""
+        future, self._pending_frame = self._pending_frame, None
+        if future is None:
+            return self._capture_frame(self.VERIFY_MAX_EDGE)
+        return future.result()
+
+    def _take_plan_frame(self):
+        """Collect the planning frame prefetched during the last verify call (or capture one now)"""
+        prefetched, self._next_plan_frame = self._next_plan_frame, None
+        if prefetched is not None:
+            captured_at, future = prefetched
+            if time.monotonic() - captured_at <= self.PREFETCH_MAX_AGE:
+                return future.result()
+        return self._capture_frame(self.PLAN_MAX_EDGE)
+
+    def ai_model_analyze_plan_execute(self, user_task, screenshot, is_verification=False, last_action=None,
+                                      screen_hash=None, base64_image=None):
         """
         Send TAGGED screenshot to Mistral (Pixtral)
         Mistral analyze, plans, and tells us what action to execute next
         """
-        
-        system_instructions = f"""
-        You are HyperOS AI, a HUMAN-LIKE desktop agent following the 'Comet Architecture'.
-        Current System: {self.os_type}
-        Screen Resolution: {self.screen_size}
-        
-        VISUAL CONTEXT:
-        The screenshot has a light-cyan coordinate grid overlay [0-1000 scale].
-        - Use these grid numbers to calculate PERFECT coordinates for your actions.
-        - X-axis (0-1000) is horizontal (left to right).
-        - Y-axis (0-1000) is vertical (top to bottom).
-        
-        GOAL: Complete user tasks using GUI interactions ONLY. 
-        - DO NOT suggest terminal commands.
-        - Perform actions exactly like a human: click Start, click Icons, click Menus.
-        
-        Respond ONLY in JSON format:
-        {{
-          "screen_analysis": {{
-            "description": "What do you see relative to the grid?",
-            "elements": [
-              {{"name": "App Icon", "coords_1000": [x, y], "type": "icon|button|text"}}
-            ]
-          }},
-          "next_action": {{
-            "type": "click" | "type" | "press_key" | "scroll" | "wait" | "done",
-            "target": "element name",
-            "coords_1000": [x, y],
-            "text": "text content",
-            "key": "key name",
-            "reasoning": "Semantic explanation of this human-like step",
-            "expected_outcome": "Visual state change"
-          }}
-        }}
-        """
+        # Same task + same (or nearly the same) screen -> reuse the previous decision
+        context = (user_task, is_verification, json.dumps(last_action, sort_keys=True) if is_verification else None)
+        if screen_hash is None:
+            screen_hash = self._dhash(screenshot)
+        cached = self._get_cached_decision(context, screen_hash)
+        if cached is not None:
+            print("♻️ Reusing cached decision for an unchanged screen")
+            return cached
+
+        # UI hasn't reacted yet - don't pay a round trip to be told to wait
+        if (is_verification and self._last_screen_hash is not None
+                and (screen_hash ^ self._last_screen_hash).bit_count() <= self.UNCHANGED_SCREEN_MAX_DISTANCE):
+            print("⏳ Screen unchanged since last request, waiting for the UI")
+            return {
+                "screen_analysis": {"description": "Screen unchanged since the last request", "elements": []},
+                "next_action": {
+                    "type": "wait",
+                    "duration": 1.0,
+                    "reasoning": "The UI has not updated yet",
+                    "expected_outcome": "Screen reflects the previous action"
+                }
+            }
 
         if is_verification:
             prompt_text = f"TASK: {user_task}\nVERIFY outcomes of {json.dumps(last_action)}. Look at the grid and determine the NEXT interaction."
@@ -110,10 +293,12 @@ class HyperOSAgent:
             prompt_text = f"USER REQUEST: {user_task}\nAnalyze the desktop state using the coordinate grid and perform the next logical interaction."
 
         try:
-            base64_image = self.encode_image(screenshot)
+            if base64_image is None:
+                max_edge = self.VERIFY_MAX_EDGE if is_verification else self.PLAN_MAX_EDGE
+                base64_image = self.encode_image(screenshot, max_edge)
             
             messages = [
-                {"role": "system", "content": system_instructions},
+                {"role": "system", "content": self.system_instructions},
                 {
                     "role": "user",
                     "content": [
@@ -124,7 +309,10 @@ class HyperOSAgent:
             ]
 
             response = self.client.chat.complete(model=self.model_name, messages=messages, response_format={"type": "json_object"})
-            return json.loads(response.choices[0].message.content)
+            self._last_screen_hash = screen_hash
+            decision = json.loads(response.choices[0].message.content)
+            self._cache_decision(context, screen_hash, decision)
+            return decision
         except Exception as e:
             print(f"Error calling Mistral: {e}")
             return None
@@ -135,45 +323,53 @@ class HyperOSAgent:
         target = action.get('target', 'N/A')
         print(f"⚡ EXECUTING: {action_type} on {target}")
         
+        success = True
         try:
-            if 'coords_1000' in action:
-                # Convert grid coords to actual pixels
-                x = int(action['coords_1000'][0] * self.screen_size.width / 1000)
-                y = int(action['coords_1000'][1] * self.screen_size.height / 1000)
-                
-                print(f"   Moving mouse to ({x}, {y}) for {action_type}")
+            with self._input_lock:
+                if 'coords_1000' in action:
+                    # Convert grid coords to actual pixels (clamped to the 0-1000 grid)
+                    gx, gy = (min(max(int(c), 0), 1000) for c in action['coords_1000'][:2])
+                    x = int(self._x_lut[gx])
+                    y = int(self._y_lut[gy])
                 
-                # Randomized human-like movement speed (0.3s to 0.7s)
-                import random
-                duration = 0.4 + (random.random() * 0.3)
+                    print(f"   Moving mouse to ({x}, {y}) for {action_type}")
                 
-                # Move mouse to target
-                pyautogui.moveTo(x, y, duration=duration, tween=pyautogui.easeInOutQuad)
+                    if self.human_motion:
+                        # Demo mode: randomized human-like movement speed (0.4s to 0.7s)
+                        duration = 0.4 + (random.random() * 0.3)
+                        pyautogui.moveTo(x, y, duration=duration, tween=pyautogui.easeInOutQuad)
+                    else:
+                        # Teleport - the model never sees the cursor travel
+                        pyautogui.moveTo(x, y)
                 
-                if action_type == 'click':
-                    pyautogui.click()
-                elif action_type == 'type':
-                    pyautogui.click() # Human clicks first to focus
-                    time.sleep(0.3)
-                    pyautogui.write(action.get('text', ''), interval=0.08)
-                elif action_type == 'scroll':
-                    # scrolls positive for up, negative for down
-                    clicks = 300 if action.get('text') == 'up' else -300
-                    pyautogui.scroll(clicks)
-            
-            elif action_type == 'press_key':
-                print(f"   Pressing key: {action.get('key')}")
-                pyautogui.press(action.get('key'))
-            elif action_type == 'wait':
-                duration = action.get('duration', 1.5)
-                print(f"   Waiting for {duration} seconds...")
-                time.sleep(duration)
+                    if action_type == 'click':
+                        pyautogui.click()
+                    elif action_type == 'type':
+                        pyautogui.click() # Human clicks first to focus
+                        # Click and keystrokes queue in order; one settle sized
+                        # to the text replaces the focus pause + per-key interval
+                        text = action.get('text', '')
+                        pyautogui.write(text)
+                        time.sleep(len(text) * self.TYPING_SETTLE_PER_CHAR)
+                    elif action_type == 'scroll':
+                        # scrolls positive for up, negative for down
+                        clicks = 300 if action.get('text') == 'up' else -300
+                        pyautogui.scroll(clicks)
             
-            time.sleep(1.0)
-            return True # Fixed return value
+                elif action_type == 'press_key':
+                    print(f"   Pressing key: {action.get('key')}")
+                    pyautogui.press(action.get('key'))
+                elif action_type == 'wait':
+                    duration = action.get('duration', 1.5)
+                    print(f"   Waiting for {duration} seconds...")
+                    time.sleep(duration)
         except Exception as e:
             print(f"❌ Action failed: {e}")
-            return False
+            success = False
+
+        # Let the UI settle and grab the verification frame in the background
+        self._pending_frame = self._pool.submit(self._capture_frame, self.VERIFY_MAX_EDGE, self.SETTLE_DELAY)
+        return success
 
     def run_cycle(self, user_task: str, history: list = None):
         """Perform ONE cycle: Analyze → Plan → Execute → Verify"""
@@ -183,8 +379,13 @@ class HyperOSAgent:
         
         # 1. ANALYZE & PLAN
         print("📸 Capturing screenshot and asking AI...")
-        screenshot = self.capture_screen()
-        decision = self.ai_model_analyze_plan_execute(user_task, screenshot)
+        screenshot, screen_hash, base64_image = self._take_plan_frame()
+        decision = self.ai_model_analyze_plan_execute(
+            user_task,
+            screenshot,
+            screen_hash=screen_hash,
+            base64_image=base64_image
+        )
         
         if not decision:
             print("❌ AI decision failed")
@@ -210,12 +411,20 @@ class HyperOSAgent:
         
         # 4. VERIFY
         print("🔍 Verifying action outcome...")
-        verify_screenshot = self.capture_screen()
+        verify_screenshot, screen_hash, base64_image = self._take_pending_frame()
+
+        # Pipeline: capture + encode the next cycle's planning frame while Pixtral verifies
+        self._next_plan_frame = (
+            time.monotonic(),
+            self._pool.submit(self._capture_frame, self.PLAN_MAX_EDGE)
+        )
         verification = self.ai_model_analyze_plan_execute(
             user_task, 
             verify_screenshot, 
             is_verification=True, 
-            last_action=next_action
+            last_action=next_action,
+            screen_hash=screen_hash,
+            base64_image=base64_image
         )
         
         print("--- CYCLE END ---\n")
@@ -240,4 +449,13 @@ class HyperOSAgent:
                 return res
         return {"status": "timeout", "message": "Maximum steps reached"}
 
-agent = HyperOSAgent()
+# Global agent instance (lazy initialization)
+_agent_instance = None
+
+
+def get_agent():
+    """Get or create the global agent instance"""
+    global _agent_instance
+    if _agent_instance is None:
+        _agent_instance = HyperOSAgent()
+    return _agent_instance
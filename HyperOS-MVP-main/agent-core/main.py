@@ -1,14 +1,21 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from agent import agent
+from agent import get_agent
 from pydantic import BaseModel
 
 class CommandRequest(BaseModel):
     command: str
     history: list = []
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the agent once at startup instead of at import time
+    get_agent()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,12 +27,12 @@ app.add_middleware(
 
 @app.get("/")
 def read_root():
-    return {"status": "HyperOS Agent Active", "system": agent.get_system_status()}
+    return {"status": "HyperOS Agent Active", "system": get_agent().get_system_status()}
 
 @app.post("/execute")
 def execute_command(req: CommandRequest):
     try:
-        result = agent.execute_instruction(req.command)
+        result = get_agent().execute_instruction(req.command)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -33,7 +40,7 @@ def execute_command(req: CommandRequest):
 @app.post("/cycle")
 def execute_cycle(req: CommandRequest):
     try:
-        result = agent.run_cycle(req.command, req.history)
+        result = get_agent().run_cycle(req.command, req.history)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -3,16 +3,21 @@ Core agent that runs analyze-plan-execute loop
 Exactly like Claude Cowork agent but with Mistral
 """
 import time
-from screen_capture import capture_screenshot
-from mistral_api import ask_mistral_what_to_do
+from collections import deque
+from screen_capture import capture_screenshot, to_screen_coords, frame_hash
+from mistral_api import ask_mistral_what_to_do, image_to_base64
 from action_executor import execute_action
-from element_detector import detect_elements
+from config import USE_OCR
 
 class HyperOSAgent:
-    def __init__(self):
+    def __init__(self, use_ocr=USE_OCR):
+        self.use_ocr = use_ocr
         self.task_in_progress = False
         self.current_task = None
-        self.conversation_history = []
+        # Only the last few steps are ever sent, and only as base64 - screenshots aren't kept
+        self.conversation_history = deque(maxlen=5)
+        # Hash of the frame before a model-issued wait - an identical next frame skips the API
+        self._wait_hash = None
         
     def execute_task(self, user_task):
         """
@@ -32,18 +37,28 @@ class HyperOSAgent:
             # STEP 1: ANALYZE - Take screenshot
             print("📸 ANALYZE: Capturing screenshot...")
             screenshot = capture_screenshot()
+            screen_hash = frame_hash(screenshot)
             
-            # Detect elements on screen using OCR
-            elements = detect_elements(screenshot)
-            print(f"   Found {len(elements)} UI elements")
+            # Detect elements on screen using OCR (opt-in, Pixtral reads the screen itself)
+            elements = []
+            if self.use_ocr:
+                from element_detector import detect_elements
+                elements = detect_elements(screenshot)
+                print(f"   Found {len(elements)} UI elements")
             
             # STEP 2: PLAN - Ask Mistral what to do next
             print("🤖 PLAN: Asking Mistral API...")
+            # Encoded inline: the request needs it straight away, so a
+            # hand-off to another thread would only add latency
+            screenshot_b64 = image_to_base64(screenshot)
             mistral_response = ask_mistral_what_to_do(
                 task=user_task,
                 screenshot=screenshot,
                 elements=elements,
-                conversation_history=self.conversation_history
+                conversation_history=self.conversation_history,
+                screenshot_base64=screenshot_b64,
+                screen_hash=screen_hash,
+                prev_hash=self._wait_hash
             )
             
             # Mistral responds with action to take
@@ -53,6 +68,10 @@ class HyperOSAgent:
             print(f"   Mistral says: {reasoning}")
             print(f"   Action: {action['type']}")
             
+            # Skip the next call only after a wait the model asked for, never twice in a row
+            waited = action['type'] == 'wait' and not mistral_response.get('cached')
+            self._wait_hash = screen_hash if waited else None
+            
             # Check if task is complete
             if action['type'] == 'task_complete':
                 print("✅ Task completed successfully!")
@@ -65,7 +84,12 @@ class HyperOSAgent:
             
             # STEP 3: EXECUTE - Perform the action
             print(f"⚡ EXECUTE: {action['type']}...")
-            execution_result = execute_action(action)
+            # Mistral sees a downscaled screenshot - map its coordinates back to the screen
+            screen_action = action
+            if 'x' in action and 'y' in action:
+                x, y = to_screen_coords(screenshot, action['x'], action['y'])
+                screen_action = dict(action, x=x, y=y)
+            execution_result = execute_action(screen_action)
             
             if execution_result['success']:
                 print(f"   ✓ Action executed successfully")
@@ -74,7 +98,7 @@ class HyperOSAgent:
             
             # Add to conversation history
             self.conversation_history.append({
-                "screenshot": screenshot,
+                "b64": screenshot_b64,
                 "action": action,
                 "result": execution_result
             })
@@ -13,3 +13,7 @@ MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "your-mistral-api-key-here")
 # Settings
 MAX_STEPS = 50
 SCREENSHOT_INTERVAL = 1.5  # seconds
+
+# OCR element detection (off by default - Pixtral reads on-screen text itself).
+# Only useful as a deterministic fallback when the vision model misreads text.
+USE_OCR = os.getenv("HYPEROS_USE_OCR", "false").lower() in ("1", "true", "yes")
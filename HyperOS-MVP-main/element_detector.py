@@ -1,9 +1,23 @@
 """
 Element detector - finds UI elements using OCR
+Uses tesserocr (in-process libtesseract) when available so the language
+model stays loaded between screenshots; falls back to pytesseract.
 """
-import pytesseract
-from PIL import Image
-import re
+import threading
+import numpy as np
+
+try:
+    from tesserocr import PyTessBaseAPI, RIL, iterate_level
+    _api = PyTessBaseAPI()
+    _api_lock = threading.Lock()  # PyTessBaseAPI is not thread-safe
+except Exception:
+    # tesserocr missing or tessdata not found - use the subprocess path
+    import pytesseract
+    _api = None
+
+# Words below this OCR confidence are mostly noise - dropping them keeps the
+# elements payload (and the prompt) small
+MIN_CONFIDENCE = 30
 
 def detect_elements(screenshot):
     """
@@ -12,28 +26,34 @@ def detect_elements(screenshot):
     """
     
     try:
+        if _api is not None:
+            return _detect_elements_tesserocr(screenshot)
+
         # Run OCR on screenshot
         ocr_data = pytesseract.image_to_data(screenshot, output_type=pytesseract.Output.DICT)
         
-        elements = []
-        n_boxes = len(ocr_data['text'])
-        
-        for i in range(n_boxes):
-            text = ocr_data['text'][i].strip()
-            
-            if text:  # If text found
-                x = ocr_data['left'][i]
-                y = ocr_data['top'][i]
-                w = ocr_data['width'][i]
-                h = ocr_data['height'][i]
-                conf = ocr_data['conf'][i]
-                
-                elements.append({
-                    "text": text,
-                    "x": x + w//2,  # Center coordinates
-                    "y": y + h//2,
-                    "confidence": conf
-                })
+        # Most OCR rows are empty or low-confidence - build one boolean mask over
+        # the columns, then touch the numeric columns only at the surviving rows
+        n = len(ocr_data['text'])
+        has_text = np.fromiter((bool(t.strip()) for t in ocr_data['text']), dtype=bool, count=n)
+        conf_all = np.asarray(ocr_data['conf'], dtype=np.float32)
+        keep = np.flatnonzero(has_text & (conf_all >= MIN_CONFIDENCE))
+        texts = [ocr_data['text'][i].strip() for i in keep]
+
+        left = np.asarray(ocr_data['left'])[keep]
+        top = np.asarray(ocr_data['top'])[keep]
+        w = np.asarray(ocr_data['width'])[keep]
+        h = np.asarray(ocr_data['height'])[keep]
+        conf = conf_all[keep].tolist()
+
+        # Center coordinates; tolist() keeps plain ints so elements stay JSON-serializable
+        xs = (left + w // 2).tolist()
+        ys = (top + h // 2).tolist()
+
+        elements = [
+            {"text": text, "x": x, "y": y, "confidence": c}
+            for text, x, y, c in zip(texts, xs, ys, conf)
+        ]
         
         return elements
     except Exception as e:
@@ -43,3 +63,26 @@ def detect_elements(screenshot):
         print("   Mac: brew install tesseract")
         print("   Linux: sudo apt-get install tesseract-ocr")
         return []
+
+def _detect_elements_tesserocr(screenshot):
+    """Word-level OCR through the resident libtesseract instance"""
+    elements = []
+
+    with _api_lock:
+        _api.SetImage(screenshot)
+        _api.Recognize()
+
+        for word in iterate_level(_api.GetIterator(), RIL.WORD):
+            text = (word.GetUTF8Text(RIL.WORD) or "").strip()
+            confidence = word.Confidence(RIL.WORD)
+
+            if text and confidence >= MIN_CONFIDENCE:  # If text found
+                x1, y1, x2, y2 = word.BoundingBox(RIL.WORD)
+                elements.append({
+                    "text": text,
+                    "x": (x1 + x2) // 2,  # Center coordinates
+                    "y": (y1 + y2) // 2,
+                    "confidence": confidence
+                })
+
+    return elements
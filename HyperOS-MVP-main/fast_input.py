@@ -0,0 +1,129 @@
+"""
+Fast input - batched mouse clicks and typing via Win32 SendInput
+One SendInput call per action instead of one PyAutoGUI round trip per event.
+Falls back to PyAutoGUI on other platforms.
+"""
+import sys
+import ctypes
+import pyautogui
+
+IS_WINDOWS = sys.platform == "win32"
+
+if IS_WINDOWS:
+    from ctypes import wintypes
+
+    INPUT_MOUSE = 0
+    INPUT_KEYBOARD = 1
+
+    MOUSEEVENTF_MOVE = 0x0001
+    MOUSEEVENTF_LEFTDOWN = 0x0002
+    MOUSEEVENTF_LEFTUP = 0x0004
+    MOUSEEVENTF_ABSOLUTE = 0x8000
+
+    KEYEVENTF_KEYUP = 0x0002
+    KEYEVENTF_UNICODE = 0x0004
+
+    # Characters that apps expect as real key presses, not unicode input
+    VIRTUAL_KEYS = {"\n": 0x0D, "\r": 0x0D, "\t": 0x09}
+
+    ULONG_PTR = ctypes.c_size_t
+
+    class MOUSEINPUT(ctypes.Structure):
+        _fields_ = [
+            ("dx", wintypes.LONG),
+            ("dy", wintypes.LONG),
+            ("mouseData", wintypes.DWORD),
+            ("dwFlags", wintypes.DWORD),
+            ("time", wintypes.DWORD),
+            ("dwExtraInfo", ULONG_PTR),
+        ]
+
+    class KEYBDINPUT(ctypes.Structure):
+        _fields_ = [
+            ("wVk", wintypes.WORD),
+            ("wScan", wintypes.WORD),
+            ("dwFlags", wintypes.DWORD),
+            ("time", wintypes.DWORD),
+            ("dwExtraInfo", ULONG_PTR),
+        ]
+
+    class HARDWAREINPUT(ctypes.Structure):
+        _fields_ = [
+            ("uMsg", wintypes.DWORD),
+            ("wParamL", wintypes.WORD),
+            ("wParamH", wintypes.WORD),
+        ]
+
+    class _INPUTUNION(ctypes.Union):
+        _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+    class INPUT(ctypes.Structure):
+        _fields_ = [("type", wintypes.DWORD), ("union", _INPUTUNION)]
+
+    _user32 = ctypes.windll.user32
+    _user32.SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+    _user32.SendInput.restype = wintypes.UINT
+
+
+def _send_input(inputs):
+    """Inject a list of INPUT structs with a single SendInput call"""
+    array = (INPUT * len(inputs))(*inputs)
+    sent = _user32.SendInput(len(inputs), array, ctypes.sizeof(INPUT))
+    if sent != len(inputs):
+        raise OSError(f"SendInput injected {sent}/{len(inputs)} events")
+
+
+def _mouse(flags, dx=0, dy=0):
+    return INPUT(type=INPUT_MOUSE, union=_INPUTUNION(mi=MOUSEINPUT(dx, dy, 0, flags, 0, 0)))
+
+
+def _key(vk=0, scan=0, flags=0):
+    return INPUT(type=INPUT_KEYBOARD, union=_INPUTUNION(ki=KEYBDINPUT(vk, scan, flags, 0, 0)))
+
+
+def click(x, y):
+    """Move to (x, y) and left-click as one batch: MOVE, LEFTDOWN, LEFTUP"""
+    if not IS_WINDOWS:
+        pyautogui.click(x, y)
+        return
+
+    pyautogui.failSafeCheck()
+
+    # Absolute coordinates are normalized to 0-65535 across the primary screen
+    width, height = _user32.GetSystemMetrics(0), _user32.GetSystemMetrics(1)
+    dx = int(x * 65535 / max(width - 1, 1))
+    dy = int(y * 65535 / max(height - 1, 1))
+
+    _send_input([
+        _mouse(MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE, dx, dy),
+        _mouse(MOUSEEVENTF_LEFTDOWN),
+        _mouse(MOUSEEVENTF_LEFTUP),
+    ])
+
+
+def write(text):
+    """Type text with a single batch of key down/up events"""
+    if not IS_WINDOWS:
+        pyautogui.write(text)
+        return
+    if not text:
+        return
+
+    pyautogui.failSafeCheck()
+
+    inputs = []
+    for char in text:
+        vk = VIRTUAL_KEYS.get(char)
+        if vk is not None:
+            inputs.append(_key(vk=vk))
+            inputs.append(_key(vk=vk, flags=KEYEVENTF_KEYUP))
+            continue
+
+        # Characters outside the BMP are sent as two UTF-16 surrogate units
+        encoded = char.encode("utf-16-le")
+        for i in range(0, len(encoded), 2):
+            unit = int.from_bytes(encoded[i:i + 2], "little")
+            inputs.append(_key(scan=unit, flags=KEYEVENTF_UNICODE))
+            inputs.append(_key(scan=unit, flags=KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))
+
+    _send_input(inputs)
@@ -3,32 +3,95 @@ Mistral API integration - sends screenshots and gets next action
 Uses Pixtral vision model for screenshot analysis
 """
 from mistralai import Mistral
+import atexit
 import base64
 import json
+import httpx
 from config import MISTRAL_API_KEY
 
-client = Mistral(api_key=MISTRAL_API_KEY)
+# One pooled HTTP/2 connection for every turn - skips the TLS handshake per call
+_http = httpx.Client(
+    http2=True,
+    timeout=60.0,
+    limits=httpx.Limits(max_keepalive_connections=4)
+)
+atexit.register(_http.close)
 
-def ask_mistral_what_to_do(task, screenshot, elements, conversation_history):
+client = Mistral(api_key=MISTRAL_API_KEY, client=_http)
+
+# Screenshots travel as JPEG - far smaller and faster to encode than PNG,
+# and Pixtral downsamples them anyway
+SCREENSHOT_FORMAT = "JPEG"
+SCREENSHOT_MIME = "image/jpeg"
+SCREENSHOT_QUALITY = 75
+
+# Static instructions, sent as the system message so the prefix is identical every call
+_SYSTEM_PROMPT = """
+You are HyperOS, a desktop automation agent. You can see the user's desktop screenshot.
+
+Analyze the screenshot and decide the NEXT action to take to complete the TASK.
+
+You can perform these actions:
+- click: Click at coordinates {"type": "click", "x": 100, "y": 200, "target": "element name"}
+- type: Type text {"type": "type", "text": "hello"}
+- press_key: Press keyboard key {"type": "press_key", "key": "enter"}
+- hotkey: Press key combination {"type": "hotkey", "keys": ["ctrl", "c"]}
+- wait: Wait for UI to load {"type": "wait", "seconds": 2}
+- task_complete: Task is done {"type": "task_complete", "message": "Success description"}
+
+Respond in JSON format ONLY (no markdown, no backticks):
+{
+  "reasoning": "explain what you see and why you're taking this action",
+  "action": {
+    "type": "click",
+    "x": 100,
+    "y": 200,
+    "target": "element name"
+  }
+}
+
+Think step by step:
+1. What do you see on the screen right now?
+2. What is the current state?
+3. What is the next step to complete the task?
+4. What action should you take?
+
+Respond ONLY with valid JSON.
+"""
+
+def ask_mistral_what_to_do(task, screenshot, elements, conversation_history, screenshot_base64=None,
+                           screen_hash=None, prev_hash=None):
     """
     Send screenshot to Mistral Pixtral and ask what action to take next
     This is the BRAIN of HyperOS - using Mistral instead of Claude
+    Pass screenshot_base64 if the screenshot was already encoded
+    conversation_history holds {"b64", "action", "result"} records - no images
+    If screen_hash equals prev_hash the screen hasn't changed, so the API call
+    is skipped and a short wait is returned (marked "cached")
     """
     
+    if screen_hash is not None and screen_hash == prev_hash:
+        return {
+            "reasoning": "Screen unchanged since last step, waiting...",
+            "action": {"type": "wait", "seconds": 0.5},
+            "cached": True
+        }
+    
     # Convert screenshot to base64
-    screenshot_base64 = image_to_base64(screenshot)
+    if screenshot_base64 is None:
+        screenshot_base64 = image_to_base64(screenshot)
     
-    # Build conversation messages for Mistral
-    messages = []
+    # Build conversation messages for Mistral - the constant system prompt first
+    messages = [{"role": "system", "content": _SYSTEM_PROMPT}]
     
     # Add conversation history (previous screenshots and actions)
-    for history_item in conversation_history[-5:]:  # Last 5 steps
+    for history_item in list(conversation_history)[-5:]:  # Last 5 steps
         messages.append({
             "role": "user",
             "content": [
                 {
                     "type": "image_url",
-                    "image_url": f"data:image/png;base64,{image_to_base64(history_item['screenshot'])}"
+                    "image_url": f"data:{SCREENSHOT_MIME};base64,{history_item['b64']}"
                 },
                 {
                     "type": "text",
@@ -41,51 +104,17 @@ def ask_mistral_what_to_do(task, screenshot, elements, conversation_history):
             "content": f"Action executed: {json.dumps(history_item['result'])}"
         })
     
-    # Add current screenshot and task
-    prompt_text = f"""
-You are HyperOS, a desktop automation agent. You can see the user's desktop screenshot.
-
-TASK: {task}
-
-DETECTED UI ELEMENTS ON SCREEN:
-{json.dumps(elements, indent=2)}
-
-Analyze the screenshot and decide the NEXT action to take to complete this task.
-
-You can perform these actions:
-- click: Click at coordinates {{"type": "click", "x": 100, "y": 200, "target": "element name"}}
-- type: Type text {{"type": "type", "text": "hello"}}
-- press_key: Press keyboard key {{"type": "press_key", "key": "enter"}}
-- hotkey: Press key combination {{"type": "hotkey", "keys": ["ctrl", "c"]}}
-- wait: Wait for UI to load {{"type": "wait", "seconds": 2}}
-- task_complete: Task is done {{"type": "task_complete", "message": "Success description"}}
-
-Respond in JSON format ONLY (no markdown, no backticks):
-{{
-  "reasoning": "explain what you see and why you're taking this action",
-  "action": {{
-    "type": "click",
-    "x": 100,
-    "y": 200,
-    "target": "element name"
-  }}
-}}
-
-Think step by step:
-1. What do you see on the screen right now?
-2. What is the current state?
-3. What is the next step to complete the task?
-4. What action should you take?
-
-Respond ONLY with valid JSON.
-"""
+    # Only the per-call parts go in the user message; OCR elements are optional
+    prompt_text = f"TASK: {task}"
+    if elements:
+        prompt_text += f"\n\nDETECTED UI ELEMENTS ON SCREEN:\n{json.dumps(elements)}"
     
     messages.append({
         "role": "user",
         "content": [
             {
                 "type": "image_url",
-                "image_url": f"data:image/png;base64,{screenshot_base64}"
+                "image_url": f"data:{SCREENSHOT_MIME};base64,{screenshot_base64}"
             },
             {
                 "type": "text",
@@ -94,23 +123,28 @@ Respond ONLY with valid JSON.
         ]
     })
     
-    # Call Mistral Pixtral API
+    # Call Mistral Pixtral API - streamed, so we can stop as soon as the JSON is complete
+    response_text = ""
     try:
-        response = client.chat.complete(
+        parsed_response = None
+        with client.chat.stream(
             model="pixtral-12b-2409",  # Mistral's vision model
             messages=messages,
-            max_tokens=2000,
+            max_tokens=400,  # reasoning + one action fits easily
             temperature=0.1
-        )
-        
-        # Parse response
-        response_text = response.choices[0].message.content
-        
-        # Clean up response (remove markdown if present)
-        response_text = response_text.replace("```json", "").replace("```", "").strip()
+        ) as stream:
+            for chunk in stream:
+                delta = chunk.data.choices[0].delta.content
+                if not delta:
+                    continue
+                response_text += delta
+                parsed_response = _try_parse_action(response_text)
+                if parsed_response is not None:
+                    break  # leaving the block closes the stream
         
-        # Parse JSON
-        parsed_response = json.loads(response_text)
+        if parsed_response is None:
+            # Stream ended without a parseable object - parse the full text for the error path
+            parsed_response = json.loads(_strip_markdown(response_text))
         
         return parsed_response
         
@@ -128,9 +162,23 @@ Respond ONLY with valid JSON.
             "action": {"type": "wait", "seconds": 2}
         }
 
+def _strip_markdown(text):
+    """Remove ```json fences the model sometimes wraps its answer in"""
+    return text.replace("```json", "").replace("```", "").strip()
+
+def _try_parse_action(text):
+    """Return the parsed response once text holds a complete JSON object, else None"""
+    text = _strip_markdown(text)
+    if not text.endswith("}"):
+        return None
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
 def image_to_base64(image):
     """Convert PIL Image to base64 string"""
     from io import BytesIO
     buffered = BytesIO()
-    image.save(buffered, format="PNG")
+    image.convert("RGB").save(buffered, format=SCREENSHOT_FORMAT, quality=SCREENSHOT_QUALITY, optimize=False)
     return base64.b64encode(buffered.getvalue()).decode()
@@ -1,21 +1,65 @@
 """
 Screen capture - takes screenshots of desktop
+Uses mss, which reuses one capture handle per thread instead of setting up
+a fresh GDI/X11 grab for every screenshot
 """
-from PIL import ImageGrab
+import threading
+from PIL import Image
+import mss
 import numpy as np
 
-def capture_screenshot():
+# mss handles must not be shared across threads (tasks run on worker threads)
+_local = threading.local()
+
+def _get_sct():
+    sct = getattr(_local, 'sct', None)
+    if sct is None:
+        sct = _local.sct = mss.mss()
+    return sct
+
+def _grab(region):
+    raw = _get_sct().grab(region)
+    return Image.frombytes("RGB", raw.size, raw.rgb)
+
+def capture_screenshot(max_dim=1536, all_screens=False):
     """
     Capture full desktop screenshot
-    Returns PIL Image object
+    Returns PIL Image object, downscaled to fit within max_dim x max_dim
+    (pass max_dim=None for full resolution). The capture size is kept in
+    screenshot.info['screen_size'] so coordinates can be mapped back.
     """
-    screenshot = ImageGrab.grab()
+    sct = _get_sct()
+    # monitors[0] spans every screen, monitors[1] is the primary one
+    screenshot = _grab(sct.monitors[0] if all_screens else sct.monitors[1])
+    screen_size = screenshot.size
+    if max_dim:
+        screenshot.thumbnail((max_dim, max_dim), Image.BILINEAR)
+    screenshot.info['screen_size'] = screen_size
     return screenshot
 
+def to_screen_coords(screenshot, x, y):
+    """
+    Map (x, y) on a possibly downscaled screenshot back to screen pixels
+    """
+    screen_w, screen_h = screenshot.info.get('screen_size', screenshot.size)
+    return (
+        int(x * screen_w / screenshot.width),
+        int(y * screen_h / screenshot.height)
+    )
+
+def frame_hash(image, hash_size=8):
+    """
+    Difference hash of a screenshot - equal hashes mean the screen hasn't
+    visibly changed. One bit per horizontally adjacent brightness comparison.
+    """
+    small = image.resize((hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0).convert("L")
+    px = np.asarray(small, dtype=np.int16)
+    bits = np.packbits(px[:, 1:] > px[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
 def capture_region(x, y, width, height):
     """
     Capture specific region of screen
     """
-    bbox = (x, y, x + width, y + height)
-    screenshot = ImageGrab.grab(bbox)
+    screenshot = _grab({"left": x, "top": y, "width": width, "height": height})
     return screenshot
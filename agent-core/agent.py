@@ -3,17 +3,25 @@ HyperOS Agent Core - Vision-enabled desktop AI agent
 Uses Gemini 1.5 Flash for screen analysis and action planning
 """
 
+import io
 import os
+import copy
+import hashlib
 import time
-import json
 import logging
 import platform
 import threading
-from typing import Optional, Dict, Any, List, Tuple
-from dataclasses import dataclass
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple, Callable
+from dataclasses import dataclass, field
 from enum import Enum
 
+import mss
+import numpy as np
+import orjson
 import pyautogui
+from mss.exception import ScreenShotError
 from PIL import Image
 import google.generativeai as genai
 from dotenv import load_dotenv
@@ -67,6 +75,80 @@ class AgentResponse:
     action: str
     parameters: Dict[str, Any]
     done: bool
+    # Multi-action turn: every action in order, the first mirrored in action/parameters
+    actions: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Text of a streamed Gemini chunk ('' for chunks without text parts)"""
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+# Actions that can run with default parameters
+_PARAMETERLESS_ACTIONS = frozenset({ActionType.WAIT.value, ActionType.DONE.value})
+
+
+class _EarlyActionParser:
+    """
+    Incremental scanner over a streamed JSON object.
+    
+    Tracks nesting and strings as text arrives. At every top-level comma
+    it tries to close the object there; once the prefix already holds
+    the action, its parameters and "done", those are returned without waiting
+    for the rest (normally the long "thinking" field).
+    """
+    
+    def __init__(self) -> None:
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+    
+    def feed(self, text: str) -> Optional[Dict[str, Any]]:
+        """Add streamed text; return the action fields as soon as they're complete"""
+        self.text += text
+        for i in range(self._pos, len(self.text)):
+            char = self.text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                data = self._try_prefix(i)
+                if data is not None:
+                    self._pos = i + 1
+                    return data
+        self._pos = len(self.text)
+        return None
+    
+    def _try_prefix(self, end: int) -> Optional[Dict[str, Any]]:
+        start = self.text.find("{")
+        try:
+            data = orjson.loads(self.text[start:end] + "}")
+        except orjson.JSONDecodeError:
+            return None
+        if not isinstance(data, dict) or "done" not in data:
+            return None
+        # Only act once the action can run as sent: a batch, or a single
+        # action whose parameters have arrived (wait/done can do without)
+        if "actions" in data:
+            return data
+        if "action" in data and ("parameters" in data or data["action"] in _PARAMETERLESS_ACTIONS):
+            return data
+        return None
 
 
 class HyperOSAgent:
@@ -76,7 +158,19 @@ class HyperOSAgent:
     """
     
     MAX_STEPS = 20
-    STEP_DELAY = 1.0  # seconds between steps
+    STEP_DELAY = 1.0  # fallback delay between steps when the screen can't be polled
+    SETTLE_MIN = 0.15  # give the app a moment to start reacting before polling
+    SETTLE_MAX = 1.5
+    SETTLE_POLL_INTERVAL = 0.05
+    SETTLE_TILE = 128  # side of the centre tile compared while polling
+    VLM_MAX_EDGE = 1280  # longest screenshot edge sent to Gemini
+    VLM_JPEG_QUALITY = 80
+    PREDICTION_CACHE_SIZE = 32
+    CROP_TO_ACTIVE_WINDOW = True  # send only the focused window, not the whole desktop
+    PROMPT_ERROR_CHARS = 120  # error text kept per step in the prompt history
+    MAX_BATCH_ACTIONS = 4  # bounds drift between the screenshot and reality
+    STALL_FRAME_LIMIT = 3  # identical frames in a row before forcing a wait
+    THINKING_JOIN_TIMEOUT = 2.0  # how long a step waits for a streamed thinking tail
     
     def __init__(self) -> None:
         """Initialize the HyperOS Agent with Gemini AI"""
@@ -84,16 +178,56 @@ class HyperOSAgent:
         self.screen_size: Tuple[int, int] = pyautogui.size()
         self.current_task: Optional[str] = None
         self.history: List[Dict[str, Any]] = []
+        # Slim JSON (no thinking) of the last 5 finished steps, serialized once each for the prompt
+        self._history_json: "deque[str]" = deque(maxlen=5)
         self.is_running: bool = False
-        self._cancel_requested: bool = False
+        self._cancel_event = threading.Event()  # set to stop the running task
         self._lock = threading.Lock()
+        self._capture_local = threading.local()  # mss grabbers are per-thread
+        self._image_scale: float = 1.0  # screen pixels per screenshot pixel sent to Gemini
+        self._image_offset: Tuple[int, int] = (0, 0)  # screen position of the screenshot's top-left
+        # (task, exact frame hash, last action) -> (response, image scale, image offset),
+        # least recently used first
+        self._pred_cache: "OrderedDict[Tuple[str, bytes, Optional[str]], Tuple[AgentResponse, float, Tuple[int, int]]]" = OrderedDict()
+        self._last_frame_hash: Optional[int] = None
+        self._last_exact_hash: Optional[bytes] = None
+        self._same_frame_count: int = 0
+        # Background reader filling in the last streamed response's thinking
+        self._drain_thread: Optional[threading.Thread] = None
+        # Action name -> handler, built once instead of an if/elif chain per call
+        self._action_handlers: Dict[str, Callable[[Dict[str, Any]], ActionResult]] = {
+            ActionType.CLICK.value: self._do_click,
+            ActionType.TYPE.value: self._do_type,
+            ActionType.PRESS_KEY.value: self._do_press_key,
+            ActionType.WAIT.value: self._do_wait,
+            ActionType.DONE.value: self._do_done,
+        }
+        # Captures the next frame while the loop finishes the current step
+        self._capture_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hyperos-capture")
         
         # Validate and configure Gemini API
         self._init_gemini()
         
+        # Pay first-use costs (display context, input bindings, imports) now,
+        # on the capture thread that will grab every frame, not in step 1
+        self._warmed = threading.Event()
+        self._capture_executor.submit(self._warm_up)
+        
         logger.info(f"HyperOS Agent initialized on {self.os_type}")
         logger.info(f"Screen resolution: {self.screen_size[0]}x{self.screen_size[1]}")
     
+    def _warm_up(self) -> None:
+        """Throwaway capture and input probe so the first real step isn't slow"""
+        try:
+            sct = self._get_grabber()
+            sct.grab(sct.monitors[1])
+            pyautogui.position()
+            import tools.window_manager  # noqa: F401 - first title lookup skips the import
+        except Exception as e:
+            logger.debug(f"Warm-up skipped: {e}")
+        finally:
+            self._warmed.set()
+    
     def _init_gemini(self) -> None:
         """Initialize Gemini AI with API key validation"""
         gemini_key = os.getenv("GEMINI_API_KEY")
@@ -116,7 +250,14 @@ class HyperOSAgent:
             logger.error(error_msg)
             raise ValueError(error_msg)
         
-        genai.configure(api_key=gemini_key)
+        # gRPC keeps one multiplexed HTTP/2 channel open for the whole
+        # session, so steps after the first skip the TCP + TLS handshake
+        genai.configure(api_key=gemini_key, transport="grpc")
+        
+        # Built once and bound to the model, so each step only sends the
+        # task, recent history and screenshot
+        self._system_instructions = self._build_system_instructions()
+        
         # Try different model names for compatibility (with version suffixes)
         model_names = [
             'gemini-1.5-flash-002',  # Production-ready version
@@ -128,7 +269,10 @@ class HyperOSAgent:
         
         for model_name in model_names:
             try:
-                self.model = genai.GenerativeModel(model_name)
+                self.model = genai.GenerativeModel(
+                    model_name,
+                    system_instruction=self._system_instructions
+                )
                 # Test if model works by checking its name
                 logger.info(f"Successfully initialized model: {model_name}")
                 break
@@ -143,6 +287,61 @@ class HyperOSAgent:
                 "Get your API key at: https://makersuite.google.com/app/apikey"
             )
     
+    def _build_system_instructions(self) -> str:
+        """Build the static system prompt (depends only on OS and screen size)"""
+        return f"""You are HyperOS AI, an autonomous desktop automation agent.
+
+SYSTEM CONTEXT:
+- Operating System: {self.os_type}
+- Screen Resolution: {self.screen_size[0]}x{self.screen_size[1]}
+- Coordinates are in screenshot pixels (the screenshot may be smaller than the screen)
+
+YOUR MISSION:
+Analyze the screenshot and determine the SINGLE next action to complete the user's task.
+
+AVAILABLE ACTIONS:
+1. click - Click at screen coordinates
+   Parameters: {{"x": int, "y": int}}
+   
+2. type - Type text (optionally at coordinates)
+   Parameters: {{"text": str, "x": int (optional), "y": int (optional)}}
+   
+3. press_key - Press a keyboard key
+   Parameters: {{"key": str}} (e.g., "enter", "tab", "escape", "ctrl+c")
+   
+4. wait - Wait for UI to update
+   Parameters: {{"seconds": float}}
+   
+5. done - Task is complete
+   Parameters: {{"reason": str}}
+
+RESPONSE FORMAT (JSON only, keys in this order - "thinking" last):
+{{
+    "action": "click|type|press_key|wait|done",
+    "parameters": {{}},
+    "done": false,
+    "thinking": "Your analysis of the current screen state and reasoning"
+}}
+
+When the next few actions don't depend on seeing the screen in between
+(e.g. type text, then press enter), you may return up to {self.MAX_BATCH_ACTIONS} of them in order:
+{{
+    "actions": [
+        {{"action": "type", "parameters": {{"text": "hello"}}}},
+        {{"action": "press_key", "parameters": {{"key": "enter"}}}}
+    ],
+    "done": false,
+    "thinking": "..."
+}}
+They run in order and stop at the first failure; you see the screen again afterwards.
+
+RULES:
+- Return ONLY valid JSON, no markdown or extra text
+- Be precise with coordinates - aim for center of UI elements
+- If task appears complete, set action to "done" and done to true
+- If stuck or cannot proceed, set action to "done" with explanation
+"""
+    
     def get_system_status(self) -> Dict[str, Any]:
         """Get current system status information"""
         return {
@@ -153,27 +352,184 @@ class HyperOSAgent:
             "current_task": self.current_task
         }
     
+    def _get_grabber(self) -> "mss.base.MSSBase":
+        """Return this thread's persistent mss grabber, creating it on first use"""
+        sct = getattr(self._capture_local, "sct", None)
+        if sct is None:
+            sct = self._capture_local.sct = mss.mss()
+        return sct
+    
     @retry_with_backoff(
         max_retries=3,
         base_delay=1.0,
-        retryable_exceptions=(OSError, pyautogui.FailSafeException)
+        retryable_exceptions=(OSError, ScreenShotError, pyautogui.FailSafeException)
     )
     def capture_screen(self) -> Image.Image:
         """
         Capture the current screen state.
         
+        Reuses a persistent mss grabber instead of setting up a new
+        screen grab for every call.
+        
         Returns:
             PIL Image of the current screen
         """
         logger.debug("Capturing screen...")
         try:
-            screenshot = pyautogui.screenshot()
+            sct = self._get_grabber()
+            raw = sct.grab(sct.monitors[1])
+            # Decode BGRA straight into RGB, no per-pixel conversion pass
+            screenshot = Image.frombytes("RGB", raw.size, raw.bgra, "raw", "BGRX")
+            # Hash from the raw buffer now, so the unchanged-screen check needs no PIL pass
+            screenshot.info["frame_hash"] = self._raw_frame_hash(raw)
             logger.debug(f"Screen captured: {screenshot.size}")
             return screenshot
         except Exception as e:
             logger.error(f"Failed to capture screen: {e}")
             raise
     
+    def _prepare_image_for_vlm(self, img: Image.Image) -> Dict[str, Any]:
+        """
+        Downscale a screenshot and encode it as JPEG for upload.
+        
+        Gemini gains nothing from native resolution, so this cuts upload
+        bytes and image tokens. The scale factor is kept so coordinates
+        the model returns can be mapped back to the screen.
+        
+        Args:
+            img: Full-resolution screenshot (resized in place)
+            
+        Returns:
+            Inline image part for generate_content
+        """
+        original_width = img.width
+        img.thumbnail((self.VLM_MAX_EDGE, self.VLM_MAX_EDGE), Image.LANCZOS)
+        self._image_scale = original_width / img.width
+        
+        buf = io.BytesIO()
+        img.convert("RGB").save(buf, format="JPEG", quality=self.VLM_JPEG_QUALITY, optimize=False)
+        return {"mime_type": "image/jpeg", "data": buf.getvalue()}
+    
+    @staticmethod
+    def _frame_hash(img: Image.Image) -> int:
+        """64-bit difference hash - visually identical screens hash the same"""
+        pixels = list(img.resize((9, 8), Image.BILINEAR).convert("L").getdata())
+        bits = 0
+        for row in range(8):
+            for col in range(8):
+                i = row * 9 + col
+                bits = (bits << 1) | (pixels[i + 1] > pixels[i])
+        return bits
+    
+    @staticmethod
+    def _raw_frame_hash(sct_img: Any) -> bytes:
+        """
+        blake2b over an mss grab's whole BGRA buffer. Keys the unchanged-screen
+        check and the decision cache, so every pixel counts - a typed glyph
+        or a caret must change it.
+        """
+        return hashlib.blake2b(sct_img.raw, digest_size=8).digest()
+    
+    @staticmethod
+    def _fast_frame_hash(sct_img: Any, step: int = 8) -> bytes:
+        """
+        Hash an mss grab straight from its BGRA buffer: decimate every
+        step-th pixel's green channel (a cheap grayscale proxy) and blake2b it.
+        Only a coarse "still repainting?" signal for UI settle polling.
+        """
+        arr = np.frombuffer(sct_img.raw, np.uint8).reshape(sct_img.height, sct_img.width, 4)
+        return hashlib.blake2b(arr[::step, ::step, 1].tobytes(), digest_size=8).digest()
+    
+    @staticmethod
+    def _exact_frame_hash(img: Image.Image) -> bytes:
+        """Hash of a 64x64 grayscale thumbnail - changes on any visible repaint"""
+        thumb = img.resize((64, 64), Image.BILINEAR).convert("L")
+        return hashlib.blake2b(thumb.tobytes(), digest_size=8).digest()
+    
+    def _to_screen_coords(self, x: float, y: float) -> Tuple[int, int]:
+        """Map coordinates on the uploaded screenshot back to screen pixels"""
+        offset_x, offset_y = self._image_offset
+        return (
+            int(round(x * self._image_scale)) + offset_x,
+            int(round(y * self._image_scale)) + offset_y
+        )
+    
+    def _crop_to_active_window(self, screenshot: Image.Image) -> Image.Image:
+        """
+        Crop the screenshot to the active window's rectangle.
+        
+        Falls back to the full screenshot when the rectangle is unknown or
+        doesn't overlap the captured screen. Records the crop offset so
+        coordinates can be translated back.
+        """
+        self._image_offset = (0, 0)
+        if not self.CROP_TO_ACTIVE_WINDOW:
+            return screenshot
+        
+        rect = self._get_active_window_rect()
+        if rect is None:
+            return screenshot
+        
+        left, top, width, height = rect
+        # Maximized windows report slightly negative origins - clamp to the screen
+        box = (
+            max(left, 0),
+            max(top, 0),
+            min(left + width, screenshot.width),
+            min(top + height, screenshot.height)
+        )
+        if box[2] <= box[0] or box[3] <= box[1]:
+            return screenshot
+        
+        self._image_offset = (box[0], box[1])
+        return screenshot.crop(box)
+    
+    def _wait_for_ui_settle(self) -> None:
+        """
+        Poll a small centre tile of the screen until two consecutive
+        grabs match (the UI stopped repainting) or SETTLE_MAX elapses.
+        """
+        try:
+            sct = self._get_grabber()
+            monitor = sct.monitors[1]
+            half = self.SETTLE_TILE // 2
+            tile = {
+                "left": monitor["left"] + monitor["width"] // 2 - half,
+                "top": monitor["top"] + monitor["height"] // 2 - half,
+                "width": self.SETTLE_TILE,
+                "height": self.SETTLE_TILE,
+            }
+            
+            time.sleep(self.SETTLE_MIN)
+            deadline = time.monotonic() + self.SETTLE_MAX - self.SETTLE_MIN
+            previous = None
+            while time.monotonic() < deadline:
+                current = self._fast_frame_hash(sct.grab(tile), step=2)
+                if current == previous:
+                    return
+                previous = current
+                time.sleep(self.SETTLE_POLL_INTERVAL)
+        except Exception as e:
+            logger.debug(f"UI settle polling unavailable, using fixed delay: {e}")
+            # Interruptible - a cancel request ends the delay immediately
+            self._cancel_event.wait(timeout=self.STEP_DELAY)
+    
+    def _settle_and_capture(self, last_action: str) -> Image.Image:
+        """Let the UI react to the last action, then capture the next frame"""
+        # A wait action already slept; there's nothing to settle
+        if last_action != ActionType.WAIT.value:
+            self._wait_for_ui_settle()
+        return self.capture_screen()
+    
+    def _get_active_window_rect(self) -> Optional[Tuple[int, int, int, int]]:
+        """Safely get the active window rectangle (left, top, width, height)"""
+        try:
+            from tools.window_manager import WindowManager
+            return WindowManager.get_active_window_rect()
+        except Exception as e:
+            logger.warning(f"Could not get active window rect: {e}")
+            return None
+    
     def _get_active_window_title(self) -> str:
         """Safely get the active window title"""
         try:
@@ -199,93 +555,163 @@ class HyperOSAgent:
         Returns:
             AgentResponse with thinking, action, parameters, and done flag
         """
+        # UI hasn't repainted since the last action - wait locally instead of
+        # paying a Gemini round trip for the same decision
+        exact_hash = screenshot.info.get("frame_hash") or self._exact_frame_hash(screenshot)
+        unchanged = exact_hash == self._last_exact_hash
+        self._last_exact_hash = exact_hash
+        if unchanged and self.history and self.history[-1].get("action") != ActionType.WAIT.value:
+            logger.info("Screen unchanged since the last action, waiting for the UI")
+            return AgentResponse(
+                thinking="Screen has not changed since the last action - waiting for the UI",
+                action=ActionType.WAIT.value,
+                parameters={"seconds": 0.8},
+                done=False
+            )
+        
+        frame_hash = self._frame_hash(screenshot)
+        if frame_hash == self._last_frame_hash:
+            self._same_frame_count += 1
+        else:
+            self._last_frame_hash = frame_hash
+            self._same_frame_count = 1
+        
+        # Screen stuck on the same frame - break the loop instead of repeating ourselves
+        if self._same_frame_count >= self.STALL_FRAME_LIMIT:
+            logger.info("Screen unchanged for several steps, forcing a wait")
+            self._same_frame_count = 0
+            return AgentResponse(
+                thinking="Screen has not changed for several steps - waiting for the UI",
+                action=ActionType.WAIT.value,
+                parameters={"seconds": 1.0},
+                done=False
+            )
+        
+        # Keyed on the exact hash, so any repaint (typed text, a caret, focus)
+        # asks Gemini again; the last action keeps a decision from being
+        # replayed right after it already ran
+        last_action = self.history[-1].get("action") if self.history else None
+        cache_key = (user_task, exact_hash, last_action)
+        cached = self._pred_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Screen unchanged for this task, reusing cached decision")
+            self._pred_cache.move_to_end(cache_key)
+            # Coordinates in the cached decision refer to the crop it was made on
+            cached_response, self._image_scale, self._image_offset = cached
+            # Callers get their own copy; the entry may still be filled in by a drain
+            return copy.deepcopy(cached_response)
+        
         active_window = self._get_active_window_title()
+        view = self._crop_to_active_window(screenshot)
+        image_part = self._prepare_image_for_vlm(view)
+        view_note = " (active window only)" if view is not screenshot else ""
         
-        system_instructions = f"""You are HyperOS AI, an autonomous desktop automation agent.
-
-SYSTEM CONTEXT:
-- Operating System: {self.os_type}
-- Screen Resolution: {self.screen_size[0]}x{self.screen_size[1]}
-- Active Window: {active_window}
-
-YOUR MISSION:
-Analyze the screenshot and determine the SINGLE next action to complete the user's task.
-
-AVAILABLE ACTIONS:
-1. click - Click at screen coordinates
-   Parameters: {{"x": int, "y": int}}
-   
-2. type - Type text (optionally at coordinates)
-   Parameters: {{"text": str, "x": int (optional), "y": int (optional)}}
-   
-3. press_key - Press a keyboard key
-   Parameters: {{"key": str}} (e.g., "enter", "tab", "escape", "ctrl+c")
-   
-4. wait - Wait for UI to update
-   Parameters: {{"seconds": float}}
-   
-5. done - Task is complete
-   Parameters: {{"reason": str}}
-
-RESPONSE FORMAT (JSON only):
-{{
-    "thinking": "Your analysis of the current screen state and reasoning",
-    "action": "click|type|press_key|wait|done",
-    "parameters": {{}},
-    "done": false
-}}
-
-RULES:
-- Return ONLY valid JSON, no markdown or extra text
-- Be precise with coordinates - aim for center of UI elements
-- If task appears complete, set action to "done" and done to true
-- If stuck or cannot proceed, set action to "done" with explanation
-"""
-
-        prompt = f"""{system_instructions}
+        prompt = f"""ACTIVE WINDOW: {active_window}
+SCREENSHOT SIZE: {view.width}x{view.height}{view_note}
 
 USER TASK: {user_task}
 
 PREVIOUS ACTIONS IN THIS SESSION:
-{json.dumps(self.history[-5:], indent=2) if self.history else "None yet"}
+{'[' + ','.join(self._history_json) + ']' if self._history_json else "None yet"}
 
 Analyze the attached screenshot and provide the next action as JSON."""
 
         logger.info("Sending request to Gemini AI...")
         
-        try:
-            # Try with system_instruction parameter (newer API)
-            response = self.model.generate_content(
-                [prompt, screenshot],
-                generation_config={"response_mime_type": "application/json"},
-                system_instruction=system_instructions
-            )
-        except TypeError:
-            # Fallback: system instructions already in prompt
-            response = self.model.generate_content(
-                [prompt, screenshot],
-                generation_config={"response_mime_type": "application/json"}
-            )
+        # Static instructions were bound to the model in _init_gemini.
+        # Streamed, so we can act as soon as the action fields are complete.
+        response = self.model.generate_content(
+            [prompt, image_part],
+            generation_config={"response_mime_type": "application/json"},
+            stream=True
+        )
         
-        content = response.text.strip()
-        logger.debug(f"Raw Gemini response: {content[:200]}...")
+        parser = _EarlyActionParser()
+        chunks = iter(response)
+        data = None
+        for chunk in chunks:
+            data = parser.feed(_chunk_text(chunk))
+            if data is not None:
+                break
         
-        # Clean up response if wrapped in markdown
-        if content.startswith("```json"):
-            content = content.split("```json")[1].split("```")[0].strip()
-        elif content.startswith("```"):
-            content = content.split("```")[1].split("```")[0].strip()
+        if data is not None:
+            # Action is known - let the thinking tail finish in the background,
+            # filling in both the returned response and its cached copy
+            ai_response = self._response_from_data(data)
+            cached_response = copy.deepcopy(ai_response)
+            self._drain_thread = threading.Thread(
+                target=self._drain_thinking,
+                args=(chunks, parser, (ai_response, cached_response)),
+                daemon=True
+            )
+            self._drain_thread.start()
+        else:
+            content = parser.text
+            logger.debug(f"Raw Gemini response: {content[:200]}...")
+            
+            # application/json responses are bare JSON - only strip markdown
+            # fences when the first non-blank character says there are some
+            if content.lstrip()[:1] == "`":
+                content = content.strip()
+                if content.startswith("```json"):
+                    content = content.split("```json")[1].split("```")[0].strip()
+                else:
+                    content = content.split("```")[1].split("```")[0].strip()
+            
+            # Parse JSON response
+            ai_response = self._response_from_data(orjson.loads(content))
+            cached_response = copy.deepcopy(ai_response)
+        
+        self._pred_cache[cache_key] = (cached_response, self._image_scale, self._image_offset)
+        if len(self._pred_cache) > self.PREDICTION_CACHE_SIZE:
+            self._pred_cache.popitem(last=False)
         
-        # Parse JSON response
-        data = json.loads(content)
+        return ai_response
+    
+    def _join_drain(self) -> None:
+        """Wait (bounded) for the streamed thinking tail of the last Gemini call"""
+        drain, self._drain_thread = self._drain_thread, None
+        if drain is not None:
+            drain.join(timeout=self.THINKING_JOIN_TIMEOUT)
+            if drain.is_alive():
+                logger.debug("Thinking stream still open, recording the step without it")
+    
+    def _response_from_data(self, data: Dict[str, Any]) -> AgentResponse:
+        """Build an AgentResponse from parsed Gemini JSON"""
+        actions = data.get("actions")
+        if isinstance(actions, list) and actions:
+            # Multi-action turn - the first action drives the usual fields
+            actions = [a for a in actions if isinstance(a, dict)][:self.MAX_BATCH_ACTIONS]
+            first = actions[0] if actions else {}
+            action = first.get("action", "done")
+            parameters = first.get("parameters", {})
+        else:
+            actions = []
+            action = data.get("action", "done")
+            parameters = data.get("parameters", {})
         
         return AgentResponse(
             thinking=data.get("thinking", ""),
-            action=data.get("action", "done"),
-            parameters=data.get("parameters", {}),
-            done=data.get("done", False)
+            action=action,
+            parameters=parameters,
+            done=data.get("done", False),
+            actions=actions
         )
     
+    @staticmethod
+    def _drain_thinking(
+        chunks: Any, parser: "_EarlyActionParser", responses: Tuple[AgentResponse, ...]
+    ) -> None:
+        """Consume the rest of a stream and fill in the responses' thinking"""
+        try:
+            for chunk in chunks:
+                parser.feed(_chunk_text(chunk))
+            thinking = orjson.loads(parser.text).get("thinking", "")
+            for ai_response in responses:
+                ai_response.thinking = thinking
+        except Exception as e:
+            logger.debug(f"Could not recover thinking from stream tail: {e}")
+    
     def execute_action(self, action: str, parameters: Dict[str, Any]) -> ActionResult:
         """
         Execute a single action using pyautogui.
@@ -299,85 +725,21 @@ Analyze the attached screenshot and provide the next action as JSON."""
         """
         logger.info(f"Executing action: {action} with params: {parameters}")
         
+        # Nothing can fail when finishing a task
+        if action == ActionType.DONE.value:
+            return self._do_done(parameters)
+        
+        handler = self._action_handlers.get(action)
+        if handler is None:
+            return ActionResult(
+                success=False,
+                action_type=action,
+                message="Unknown action type",
+                error=f"Action '{action}' is not recognized"
+            )
+        
         try:
-            if action == ActionType.CLICK.value:
-                x = parameters.get("x", 0)
-                y = parameters.get("y", 0)
-                
-                # Validate coordinates
-                if not (0 <= x <= self.screen_size[0] and 0 <= y <= self.screen_size[1]):
-                    return ActionResult(
-                        success=False,
-                        action_type=action,
-                        message="Invalid coordinates",
-                        error=f"Coordinates ({x}, {y}) outside screen bounds"
-                    )
-                
-                pyautogui.click(x, y)
-                return ActionResult(
-                    success=True,
-                    action_type=action,
-                    message=f"Clicked at ({x}, {y})"
-                )
-                
-            elif action == ActionType.TYPE.value:
-                text = parameters.get("text", "")
-                x = parameters.get("x")
-                y = parameters.get("y")
-                
-                # Click first if coordinates provided
-                if x is not None and y is not None:
-                    pyautogui.click(x, y)
-                    time.sleep(0.3)
-                
-                pyautogui.write(text, interval=0.05)
-                return ActionResult(
-                    success=True,
-                    action_type=action,
-                    message=f"Typed: '{text[:50]}{'...' if len(text) > 50 else ''}'"
-                )
-                
-            elif action == ActionType.PRESS_KEY.value:
-                key = parameters.get("key", "")
-                
-                # Handle key combinations (e.g., "ctrl+c")
-                if "+" in key:
-                    keys = key.split("+")
-                    pyautogui.hotkey(*keys)
-                else:
-                    pyautogui.press(key)
-                    
-                return ActionResult(
-                    success=True,
-                    action_type=action,
-                    message=f"Pressed key: {key}"
-                )
-                
-            elif action == ActionType.WAIT.value:
-                seconds = parameters.get("seconds", 1.0)
-                time.sleep(min(seconds, 10.0))  # Cap at 10 seconds
-                return ActionResult(
-                    success=True,
-                    action_type=action,
-                    message=f"Waited {seconds} seconds"
-                )
-                
-            elif action == ActionType.DONE.value:
-                reason = parameters.get("reason", "Task completed")
-                return ActionResult(
-                    success=True,
-                    action_type=action,
-                    message=reason
-                )
-                
-            else:
-                return ActionResult(
-                    success=False,
-                    action_type=action,
-                    message="Unknown action type",
-                    error=f"Action '{action}' is not recognized"
-                )
-                
+            return handler(parameters)
         except Exception as e:
             logger.error(f"Action execution failed: {e}")
             return ActionResult(
@@ -387,14 +749,110 @@ Analyze the attached screenshot and provide the next action as JSON."""
                 error=str(e)
             )
     
+    def _do_click(self, parameters: Dict[str, Any]) -> ActionResult:
+        """Click at the given screenshot coordinates"""
+        x, y = self._to_screen_coords(parameters.get("x", 0), parameters.get("y", 0))
+        
+        # Validate coordinates
+        if not (0 <= x <= self.screen_size[0] and 0 <= y <= self.screen_size[1]):
+            return ActionResult(
+                success=False,
+                action_type=ActionType.CLICK.value,
+                message="Invalid coordinates",
+                error=f"Coordinates ({x}, {y}) outside screen bounds"
+            )
+        
+        pyautogui.click(x, y)
+        return ActionResult(
+            success=True,
+            action_type=ActionType.CLICK.value,
+            message=f"Clicked at ({x}, {y})"
+        )
+    
+    def _do_type(self, parameters: Dict[str, Any]) -> ActionResult:
+        """Type text, clicking the target coordinates first if given"""
+        text = parameters.get("text", "")
+        x = parameters.get("x")
+        y = parameters.get("y")
+        
+        # Click first if coordinates provided
+        if x is not None and y is not None:
+            pyautogui.click(*self._to_screen_coords(x, y))
+            time.sleep(0.3)
+        
+        pyautogui.write(text, interval=0.05)
+        return ActionResult(
+            success=True,
+            action_type=ActionType.TYPE.value,
+            message=f"Typed: '{text[:50]}{'...' if len(text) > 50 else ''}'"
+        )
+    
+    def _do_press_key(self, parameters: Dict[str, Any]) -> ActionResult:
+        """Press a key or key combination"""
+        key = parameters.get("key", "")
+        
+        # Handle key combinations (e.g., "ctrl+c")
+        if "+" in key:
+            keys = key.split("+")
+            pyautogui.hotkey(*keys)
+        else:
+            pyautogui.press(key)
+            
+        return ActionResult(
+            success=True,
+            action_type=ActionType.PRESS_KEY.value,
+            message=f"Pressed key: {key}"
+        )
+    
+    def _do_wait(self, parameters: Dict[str, Any]) -> ActionResult:
+        """Sleep to let the UI update"""
+        seconds = parameters.get("seconds", 1.0)
+        time.sleep(min(seconds, 10.0))  # Cap at 10 seconds
+        return ActionResult(
+            success=True,
+            action_type=ActionType.WAIT.value,
+            message=f"Waited {seconds} seconds"
+        )
+    
+    def _do_done(self, parameters: Dict[str, Any]) -> ActionResult:
+        """Report task completion"""
+        reason = parameters.get("reason", "Task completed")
+        return ActionResult(
+            success=True,
+            action_type=ActionType.DONE.value,
+            message=reason
+        )
+    
+    def _record_result(self, step_record: Dict[str, Any], result: ActionResult) -> None:
+        """Attach an action result to its history record and queue it for the prompt"""
+        step_record["result"] = {
+            "success": result.success,
+            "message": result.message,
+            "error": result.error
+        }
+        # The prompt only needs what happened, not the model's old reasoning
+        slim_record = {
+            "step": step_record["step"],
+            "action": step_record["action"],
+            "parameters": step_record["parameters"],
+            "result_success": result.success
+        }
+        if result.error:
+            slim_record["error"] = result.error[:self.PROMPT_ERROR_CHARS]
+        self._history_json.append(orjson.dumps(slim_record).decode())
+    
+    def shutdown(self) -> None:
+        """Flush pending checkpoints and stop background workers"""
+        checkpoint_manager.flush()
+        self._capture_executor.shutdown(wait=False)
+    
     def request_cancel(self) -> bool:
         """Request cancellation of the current task"""
-        with self._lock:
-            if self.is_running:
-                self._cancel_requested = True
-                logger.info("Cancel requested for current task")
-                return True
+        if not self.is_running:
             return False
+        self._cancel_event.set()
+        logger.info("Cancel requested for current task")
+        return True
     
     def run_task(self, user_task: str) -> Dict[str, Any]:
         """
@@ -406,6 +864,8 @@ Analyze the attached screenshot and provide the next action as JSON."""
         Returns:
             Dict with status, history, and any error messages
         """
+        # One task at a time: every task drives the same mouse, keyboard and
+        # screen, so concurrent tasks can't be batched - they'd fight over input
         with self._lock:
             if self.is_running:
                 return {
@@ -413,16 +873,22 @@ Analyze the attached screenshot and provide the next action as JSON."""
                     "message": "Another task is already running"
                 }
             self.is_running = True
-            self._cancel_requested = False
+            self._cancel_event.clear()
         
         logger.info(f"Starting task: {user_task}")
         self.current_task = user_task
         self.history = []
+        self._history_json.clear()
+        self._pred_cache.clear()
+        self._last_frame_hash = None
+        self._last_exact_hash = None
+        self._same_frame_count = 0
+        next_frame: Optional[Future] = None  # capture prefetched after the last action
         
         try:
             for step in range(self.MAX_STEPS):
                 # Check for cancellation
-                if self._cancel_requested:
+                if self._cancel_event.is_set():
                     logger.info("Task cancelled by user")
                     return {
                         "status": "cancelled",
@@ -435,9 +901,14 @@ Analyze the attached screenshot and provide the next action as JSON."""
                 logger.info(f"STEP {step + 1}/{self.MAX_STEPS}")
                 logger.info(f"{'='*50}")
                 
-                # STEP 1: Capture screen
+                # STEP 1: Capture screen (prefetched after the previous action if available)
                 try:
-                    screenshot = self.capture_screen()
+                    if next_frame is not None:
+                        screenshot = next_frame.result()
+                        next_frame = None
+                    else:
+                        # Same thread as the prefetches, so it reuses the warmed grabber
+                        screenshot = self._capture_executor.submit(self.capture_screen).result()
                 except Exception as e:
                     logger.error(f"Screen capture failed: {e}")
                     return {
@@ -486,6 +957,7 @@ Analyze the attached screenshot and provide the next action as JSON."""
                 logger.info(f"AI Action: {ai_response.action}")
                 
                 # Checkpoint state BEFORE action execution
+                # (save_checkpoint encodes here and writes in the background)
                 try:
                     checkpoint_manager.save_checkpoint(
                         task_id=f"task_{int(time.time())}", # Simple task ID
@@ -509,6 +981,8 @@ Analyze the attached screenshot and provide the next action as JSON."""
                 
                 # Check if task is complete
                 if ai_response.done or ai_response.action == ActionType.DONE.value:
+                    self._join_drain()
+                    step_record["thinking"] = ai_response.thinking
                     logger.info("✓ Task completed successfully")
                     return {
                         "status": "success",
@@ -519,18 +993,40 @@ Analyze the attached screenshot and provide the next action as JSON."""
                 
                 # STEP 3: Execute action
                 result = self.execute_action(ai_response.action, ai_response.parameters)
-                step_record["result"] = {
-                    "success": result.success,
-                    "message": result.message,
-                    "error": result.error
-                }
+                # Streamed responses fill in thinking while the action runs
+                self._join_drain()
+                step_record["thinking"] = ai_response.thinking
+                self._record_result(step_record, result)
+                last_action = ai_response.action
+                
+                # Rest of a multi-action turn - no new Gemini call until the batch ends
+                if result.success and last_action != ActionType.WAIT.value:
+                    for follow_up in ai_response.actions[1:]:
+                        follow_action = follow_up.get("action")
+                        # Stop for cancellation, or when completion needs a fresh look at the screen
+                        if self._cancel_event.is_set() or follow_action == ActionType.DONE.value:
+                            break
+                        self._wait_for_ui_settle()
+                        follow_record = {
+                            "step": step + 1,
+                            "action": follow_action,
+                            "parameters": follow_up.get("parameters", {}),
+                            "done": False
+                        }
+                        self.history.append(follow_record)
+                        result = self.execute_action(follow_action, follow_record["parameters"])
+                        self._record_result(follow_record, result)
+                        last_action = follow_action
+                        # A wait asks to observe the screen before going on
+                        if not result.success or follow_action == ActionType.WAIT.value:
+                            break
                 
                 if not result.success:
                     logger.warning(f"Action failed: {result.error}")
                     # Continue anyway - AI might recover on next step
                 
-                # Delay before next step
-                time.sleep(self.STEP_DELAY)
+                # Settle + capture the next frame in the background
+                next_frame = self._capture_executor.submit(self._settle_and_capture, last_action)
             
             # Max steps reached
             logger.warning("Maximum steps reached without completion")
@@ -551,7 +1047,7 @@ Analyze the attached screenshot and provide the next action as JSON."""
         finally:
             with self._lock:
                 self.is_running = False
-                self._cancel_requested = False
+                self._cancel_event.clear()
                 self.current_task = None
     
     def execute_instruction(self, instruction: str) -> Dict[str, Any]:
@@ -569,11 +1065,15 @@ Analyze the attached screenshot and provide the next action as JSON."""
 
 # Global agent instance (lazy initialization)
 _agent_instance: Optional[HyperOSAgent] = None
+_agent_lock = threading.Lock()
 
 
 def get_agent() -> HyperOSAgent:
-    """Get or create the global agent instance"""
+    """Get or create the global agent instance (safe to call from any thread)"""
     global _agent_instance
     if _agent_instance is None:
-        _agent_instance = HyperOSAgent()
+        with _agent_lock:
+            # Re-check: another thread may have built it while we waited
+            if _agent_instance is None:
+                _agent_instance = HyperOSAgent()
     return _agent_instance
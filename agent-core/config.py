@@ -5,7 +5,6 @@ Centralized configuration with validation using Pydantic
 
 import os
 from typing import Optional, Literal
-from pathlib import Path
 from functools import lru_cache
 
 from pydantic import Field, field_validator
@@ -164,10 +163,9 @@ class Settings(BaseSettings):
     @field_validator("log_file")
     @classmethod
     def validate_log_file(cls, v: Optional[str]) -> Optional[str]:
-        if v:
-            log_path = Path(v)
-            log_path.parent.mkdir(parents=True, exist_ok=True)
-        return v
+        # The directory is created by setup_logging when the file handler
+        # is opened, so building settings does no filesystem work
+        return v or None
     
     # ==========================================================================
     # Properties
@@ -237,16 +235,23 @@ class TestingSettings(Settings):
     gemini_api_key: str = "test_key_for_testing_only_12345"
 
 
-@lru_cache()
-def get_settings() -> Settings:
+def get_settings(env: Optional[str] = None) -> Settings:
     """
     Get cached settings instance based on environment.
     
+    Args:
+        env: Environment name; defaults to HYPEROS_ENV (or "development")
+        
     Returns:
         Settings instance appropriate for the current environment
     """
-    env = os.getenv("HYPEROS_ENV", "development").lower()
-    
+    env = (env or os.getenv("HYPEROS_ENV", "development")).lower()
+    return _settings_for(env)
+
+
+@lru_cache(maxsize=4)
+def _settings_for(env: str) -> Settings:
+    """Build settings once per resolved environment name"""
     if env == "production":
         return ProductionSettings()
     elif env == "testing":
@@ -255,20 +260,23 @@ def get_settings() -> Settings:
         return DevelopmentSettings()
 
 
+@lru_cache(maxsize=1)
 def validate_environment() -> tuple[bool, list[str]]:
     """
     Validate that all required environment variables are set.
+    The result is cached; the environment is checked once per process.
     
     Returns:
         Tuple of (is_valid, list of error messages)
     """
     errors = []
     
-    # Check for .env file
-    env_file = Path(".env")
-    if not env_file.exists():
-        example_file = Path(".env.example")
-        if example_file.exists():
+    # Check for .env files in a single directory scan
+    with os.scandir(".") as it:
+        env_files = {entry.name for entry in it if entry.name in (".env", ".env.example")}
+    
+    if ".env" not in env_files:
+        if ".env.example" in env_files:
             errors.append(
                 "No .env file found. Copy .env.example to .env and configure it."
             )
@@ -290,5 +298,8 @@ def validate_environment() -> tuple[bool, list[str]]:
     return len(errors) == 0, errors
 
 
-# Export settings instance
-settings = get_settings()
+def __getattr__(name: str):
+    # Export settings instance, built on first access rather than at import
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,17 +3,21 @@ HyperOS Error Recovery
 Retry logic, circuit breaker pattern, checkpointing, and fallback actions
 """
 
+import os
+import re
+import copy
 import time
 import logging
-import json
-from typing import TypeVar, Callable, Optional, Any, Dict
+from typing import TypeVar, Callable, Optional, Any, Dict, Tuple
 from functools import wraps
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from enum import Enum
+import queue
 import threading
-import pickle
+
+import orjson
 
 logger = logging.getLogger('HyperOS.Recovery')
 
@@ -49,6 +53,12 @@ def retry_with_backoff(
             return requests.get("https://api.example.com")
     """
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        # The whole backoff schedule is fixed at decoration time
+        delays = tuple(
+            min(base_delay * (exponential_base ** attempt), max_delay)
+            for attempt in range(max_retries)
+        )
+        
         @wraps(func)
         def wrapper(*args, **kwargs) -> T:
             last_exception = None
@@ -60,15 +70,11 @@ def retry_with_backoff(
                     last_exception = e
                     
                     if attempt < max_retries:
-                        # Calculate delay with exponential backoff
-                        delay = min(
-                            base_delay * (exponential_base ** attempt),
-                            max_delay
-                        )
+                        delay = delays[attempt]
                         
                         logger.warning(
-                            f"Attempt {attempt + 1}/{max_retries + 1} failed: {e}. "
-                            f"Retrying in {delay:.1f}s..."
+                            "Attempt %d/%d failed: %s. Retrying in %.1fs...",
+                            attempt + 1, max_retries + 1, e, delay
                         )
                         
                         if on_retry:
@@ -77,7 +83,8 @@ def retry_with_backoff(
                         time.sleep(delay)
                     else:
                         logger.error(
-                            f"All {max_retries + 1} attempts failed. Last error: {e}"
+                            "All %d attempts failed. Last error: %s",
+                            max_retries + 1, e
                         )
             
             raise last_exception
@@ -101,8 +108,8 @@ class CircuitBreakerStats:
     """Statistics for circuit breaker"""
     failures: int = 0
     successes: int = 0
-    last_failure_time: Optional[datetime] = None
-    state_changed_at: datetime = field(default_factory=datetime.now)
+    last_failure_time: Optional[float] = None  # CircuitBreaker clock seconds
+    state_changed_at: float = field(default_factory=time.monotonic)
 
 
 class CircuitBreaker:
@@ -124,7 +131,8 @@ class CircuitBreaker:
         failure_threshold: int = 5,
         recovery_timeout: float = 60.0,
         success_threshold: int = 2,
-        name: str = "default"
+        name: str = "default",
+        clock: Callable[[], float] = time.monotonic
     ):
         """
         Args:
@@ -132,14 +140,16 @@ class CircuitBreaker:
             recovery_timeout: Seconds before trying half-open
             success_threshold: Successes needed to close from half-open
             name: Circuit breaker name for logging
+            clock: Monotonic seconds source (injectable for tests)
         """
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
         self.success_threshold = success_threshold
         self.name = name
+        self._clock = clock
         
         self._state = CircuitState.CLOSED
-        self._stats = CircuitBreakerStats()
+        self._stats = CircuitBreakerStats(state_changed_at=clock())
         self._lock = threading.Lock()
     
     @property
@@ -159,14 +169,16 @@ class CircuitBreaker:
     
     def call(self, func: Callable[..., T], *args, **kwargs) -> T:
         """Execute function through circuit breaker"""
-        with self._lock:
-            self._maybe_recover()
-            
-            if self._state == CircuitState.OPEN:
-                raise CircuitOpenError(
-                    f"Circuit breaker '{self.name}' is open. "
-                    f"Service appears to be down."
-                )
+        # A closed circuit needs no lock; only open/half-open calls contend
+        if self._state is not CircuitState.CLOSED:
+            with self._lock:
+                self._maybe_recover()
+                
+                if self._state == CircuitState.OPEN:
+                    raise CircuitOpenError(
+                        f"Circuit breaker '{self.name}' is open. "
+                        f"Service appears to be down."
+                    )
         
         try:
             result = func(*args, **kwargs)
@@ -179,8 +191,8 @@ class CircuitBreaker:
     def _maybe_recover(self) -> None:
         """Check if we should try to recover from open state"""
         if self._state == CircuitState.OPEN:
-            if self._stats.last_failure_time:
-                elapsed = (datetime.now() - self._stats.last_failure_time).total_seconds()
+            if self._stats.last_failure_time is not None:
+                elapsed = self._clock() - self._stats.last_failure_time
                 if elapsed >= self.recovery_timeout:
                     logger.info(f"Circuit '{self.name}' entering half-open state")
                     self._state = CircuitState.HALF_OPEN
@@ -188,6 +200,9 @@ class CircuitBreaker:
     
     def _on_success(self) -> None:
         """Handle successful call"""
+        if self._state is CircuitState.CLOSED and not self._stats.failures:
+            return
+        
         with self._lock:
             if self._state == CircuitState.HALF_OPEN:
                 self._stats.successes += 1
@@ -202,7 +217,7 @@ class CircuitBreaker:
         """Handle failed call"""
         with self._lock:
             self._stats.failures += 1
-            self._stats.last_failure_time = datetime.now()
+            self._stats.last_failure_time = self._clock()
             
             if self._state == CircuitState.HALF_OPEN:
                 logger.warning(f"Circuit '{self.name}' reopened after failure in half-open")
@@ -218,7 +233,7 @@ class CircuitBreaker:
         """Manually reset the circuit breaker"""
         with self._lock:
             self._state = CircuitState.CLOSED
-            self._stats = CircuitBreakerStats()
+            self._stats = CircuitBreakerStats(state_changed_at=self._clock())
             logger.info(f"Circuit '{self.name}' manually reset")
 
 
@@ -231,15 +246,19 @@ class CircuitOpenError(Exception):
 # CHECKPOINT SYSTEM
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class Checkpoint:
     """Represents a saved state checkpoint"""
     task_id: str
     step_number: int
     task_description: str
     history: list
-    timestamp: datetime
+    timestamp: datetime  # an ISO string (as stored on disk) is parsed on init
     metadata: Dict[str, Any] = field(default_factory=dict)
+    
+    def __post_init__(self):
+        if isinstance(self.timestamp, str):
+            self.timestamp = datetime.fromisoformat(self.timestamp)
 
 
 class CheckpointManager:
@@ -252,6 +271,14 @@ class CheckpointManager:
         self.checkpoint_dir = Path(checkpoint_dir)
         self.checkpoint_dir.mkdir(exist_ok=True)
         self._lock = threading.Lock()
+        # task_id -> (checkpoint_id, saved_at) of the newest checkpoint written
+        self._latest: Dict[str, Tuple[str, float]] = {}
+        # Encoded checkpoints waiting for the writer thread
+        self._write_queue: "queue.Queue[Tuple[str, str, Path, bytes]]" = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._writer_loop, name="checkpoint-writer", daemon=True
+        )
+        self._writer.start()
     
     def save_checkpoint(
         self,
@@ -263,36 +290,52 @@ class CheckpointManager:
     ) -> str:
         """
         Save a checkpoint before a risky action.
+        The snapshot is encoded here and written by a background thread;
+        call flush() to wait for the file to land.
         
         Returns:
             Checkpoint ID for later restoration
         """
-        checkpoint = Checkpoint(
-            task_id=task_id,
-            step_number=step_number,
-            task_description=task_description,
-            history=history.copy(),
-            timestamp=datetime.now(),
-            metadata=metadata or {}
-        )
-        
         checkpoint_id = f"{task_id}_{step_number}_{int(time.time())}"
         checkpoint_file = self.checkpoint_dir / f"{checkpoint_id}.json"
         
-        with self._lock:
-            with open(checkpoint_file, "w", encoding="utf-8") as f:
-                json.dump({
-                    "task_id": checkpoint.task_id,
-                    "step_number": checkpoint.step_number,
-                    "task_description": checkpoint.task_description,
-                    "history": checkpoint.history,
-                    "timestamp": checkpoint.timestamp.isoformat(),
-                    "metadata": checkpoint.metadata
-                }, f, indent=2)
-        
-        logger.debug(f"Checkpoint saved: {checkpoint_id}")
+        payload = orjson.dumps({
+            "task_id": task_id,
+            "step_number": step_number,
+            "task_description": task_description,
+            "history": history,
+            "timestamp": datetime.now().isoformat(),
+            "metadata": metadata or {}
+        }, option=orjson.OPT_NON_STR_KEYS)
+        
+        self._write_queue.put((task_id, checkpoint_id, checkpoint_file, payload))
         return checkpoint_id
     
+    def _writer_loop(self) -> None:
+        """Write queued checkpoints to disk, one at a time"""
+        while True:
+            task_id, checkpoint_id, checkpoint_file, payload = self._write_queue.get()
+            try:
+                # Write beside the target and swap it in, so readers never see a
+                # partial file and the lock only covers the rename
+                tmp_file = checkpoint_file.with_suffix(".json.tmp")
+                with open(tmp_file, "wb") as f:
+                    f.write(payload)
+                
+                with self._lock:
+                    os.replace(tmp_file, checkpoint_file)
+                    self._latest[task_id] = (checkpoint_id, time.time())
+                
+                logger.debug(f"Checkpoint saved: {checkpoint_id}")
+            except Exception as e:
+                logger.error(f"Failed to write checkpoint {checkpoint_id}: {e}")
+            finally:
+                self._write_queue.task_done()
+    
+    def flush(self) -> None:
+        """Block until every queued checkpoint has been written"""
+        self._write_queue.join()
+    
     def restore_checkpoint(self, checkpoint_id: str) -> Optional[Checkpoint]:
         """
         Restore state from a checkpoint.
@@ -300,22 +343,21 @@ class CheckpointManager:
         Returns:
             Checkpoint data or None if not found
         """
+        self.flush()
         checkpoint_file = self.checkpoint_dir / f"{checkpoint_id}.json"
         
         if not checkpoint_file.exists():
             logger.warning(f"Checkpoint not found: {checkpoint_id}")
             return None
         
-        with self._lock:
-            with open(checkpoint_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+        data = orjson.loads(checkpoint_file.read_bytes())
         
         checkpoint = Checkpoint(
             task_id=data["task_id"],
             step_number=data["step_number"],
             task_description=data["task_description"],
             history=data["history"],
-            timestamp=datetime.fromisoformat(data["timestamp"]),
+            timestamp=data["timestamp"],
             metadata=data.get("metadata", {})
         )
         
@@ -324,14 +366,29 @@ class CheckpointManager:
     
     def get_latest_checkpoint(self, task_id: str) -> Optional[Checkpoint]:
         """Get the most recent checkpoint for a task"""
-        checkpoints = list(self.checkpoint_dir.glob(f"{task_id}_*.json"))
+        self.flush()
+        with self._lock:
+            cached = self._latest.get(task_id)
+        
+        if cached and (self.checkpoint_dir / f"{cached[0]}.json").exists():
+            return self.restore_checkpoint(cached[0])
+        
+        prefix = f"{task_id}_"
+        with os.scandir(self.checkpoint_dir) as it:
+            checkpoints = [
+                entry for entry in it
+                if entry.name.startswith(prefix) and entry.name.endswith(".json")
+            ]
         
         if not checkpoints:
             return None
         
-        # Sort by modification time, get latest
-        latest = max(checkpoints, key=lambda p: p.stat().st_mtime)
-        checkpoint_id = latest.stem
+        # Sort by modification time, get latest (DirEntry caches its stat)
+        latest = max(checkpoints, key=lambda e: e.stat().st_mtime)
+        checkpoint_id = latest.name[:-len(".json")]
+        
+        with self._lock:
+            self._latest[task_id] = (checkpoint_id, latest.stat().st_mtime)
         
         return self.restore_checkpoint(checkpoint_id)
     
@@ -342,14 +399,29 @@ class CheckpointManager:
         Returns:
             Number of checkpoints removed
         """
-        cutoff = datetime.now() - timedelta(hours=max_age_hours)
-        removed = 0
+        self.flush()
+        cutoff_ts = time.time() - max_age_hours * 3600.0
         
+        # Scanning and unlinking are filesystem-only, so they run without
+        # the lock and never hold up a concurrent save_checkpoint
+        with os.scandir(self.checkpoint_dir) as it:
+            stale = [
+                entry for entry in it
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff_ts
+            ]
+        for entry in stale:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+        removed = len(stale)
+        
+        # Forget index entries whose checkpoint was just removed
+        removed_ids = {entry.name[:-len(".json")] for entry in stale}
         with self._lock:
-            for checkpoint_file in self.checkpoint_dir.glob("*.json"):
-                if datetime.fromtimestamp(checkpoint_file.stat().st_mtime) < cutoff:
-                    checkpoint_file.unlink()
-                    removed += 1
+            for task_id, (checkpoint_id, _) in list(self._latest.items()):
+                if checkpoint_id in removed_ids:
+                    del self._latest[task_id]
         
         if removed:
             logger.info(f"Cleaned up {removed} old checkpoints")
@@ -361,6 +433,33 @@ class CheckpointManager:
 # FALLBACK ACTIONS
 # =============================================================================
 
+# Error text keywords per failure kind, checked in priority order: a message
+# mentioning both a quota and auth is a rate limit
+_AI_ERROR_KINDS: Tuple[Tuple[str, "re.Pattern[str]"], ...] = (
+    ("rate", re.compile(r"rate|quota|429|exhausted", re.IGNORECASE)),
+    ("unavailable", re.compile(r"unavailable|503", re.IGNORECASE)),
+    ("auth", re.compile(r"auth|key|401", re.IGNORECASE)),
+)
+
+# Fixed fallback templates; handle_ai_failure hands out deep copies, since
+# callers pass the parameters on and may modify them
+_RATE_LIMIT_ACTION: Dict[str, Any] = {
+    "action": "wait",
+    "parameters": {"seconds": 10},
+    "reason": "Fallback: rate limited, waiting"
+}
+_UNAVAILABLE_ACTION: Dict[str, Any] = {
+    "action": "done",
+    "parameters": {"reason": "Task aborted: AI service unavailable"},
+    "done": True
+}
+_AUTH_FAILED_ACTION: Dict[str, Any] = {
+    "action": "done",
+    "parameters": {"reason": "Task aborted: API authentication failed"},
+    "done": True
+}
+
+
 class FallbackActions:
     """
     Provides fallback actions when AI fails or produces invalid responses.
@@ -411,24 +510,21 @@ class FallbackActions:
         Returns:
             Fallback action dictionary
         """
-        error_str = str(error).lower()
+        error_str = str(error)
+        kind = next((kind for kind, pattern in _AI_ERROR_KINDS if pattern.search(error_str)), None)
         
         # Rate limit error - wait longer
-        if "rate" in error_str or "quota" in error_str:
+        if kind == "rate":
             logger.warning("AI rate limited, using extended wait")
-            return {
-                "action": "wait",
-                "parameters": {"seconds": 10},
-                "reason": "Fallback: rate limited, waiting"
-            }
+            return copy.deepcopy(_RATE_LIMIT_ACTION)
         
         # API unavailable - abort
-        if "unavailable" in error_str or "503" in error_str:
-            return cls.get_abort_action("AI service unavailable")
+        if kind == "unavailable":
+            return copy.deepcopy(_UNAVAILABLE_ACTION)
         
         # Auth error - abort
-        if "auth" in error_str or "key" in error_str or "401" in error_str:
-            return cls.get_abort_action("API authentication failed")
+        if kind == "auth":
+            return copy.deepcopy(_AUTH_FAILED_ACTION)
         
         # Retry if under limit
         if retry_count < max_retries:
@@ -4,23 +4,69 @@ Rotating file handler, colored console output, correlation IDs
 """
 
 import os
+import re
 import sys
+import copy
+import time
+import queue
+import atexit
+import secrets
+import itertools
 import logging
-import uuid
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from pathlib import Path
 from typing import Optional
 from contextvars import ContextVar
-from datetime import datetime
+
+import orjson
 
 # Context variable for request correlation ID
 correlation_id: ContextVar[str] = ContextVar('correlation_id', default='')
 
+# Placeholder shown when no correlation ID is set
+NO_CORRELATION_ID = '--------'
+
+# Records waiting for the listener thread; beyond this, sub-ERROR records drop
+LOG_QUEUE_SIZE = 10000
+
+# Generated correlation IDs: 80-bit per-process random prefix + running counter
+_CORR_PREFIX = secrets.token_hex(10)
+_corr_counter = itertools.count()
+
+# Listener that drives the real handlers and the root handler feeding it,
+# set by setup_logging
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+# =============================================================================
+# CORRELATION FILTER
+# =============================================================================
+
+class CorrelationFilter(logging.Filter):
+    """
+    Stamps record.correlation_id (full) and record.short_correlation_id
+    once per record, before any formatter runs. Installed on every handler;
+    later handlers reuse the stamp.
+    """
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'correlation_id'):
+            record.correlation_id = correlation_id.get() or NO_CORRELATION_ID
+        if not hasattr(record, 'short_correlation_id'):
+            # Console and file lines show the tail, the part that varies between IDs
+            record.short_correlation_id = str(record.correlation_id)[-8:]
+        return True
+
 
 # =============================================================================
 # COLORED FORMATTER
 # =============================================================================
 
+# Matches the level name field in a format string, capturing its width
+_LEVELNAME_FIELD = re.compile(r"%\(levelname\)(-?\d*)s")
+
+
 class ColoredFormatter(logging.Formatter):
     """
     Formatter that adds ANSI colors to log levels for console output.
@@ -37,29 +83,60 @@ class ColoredFormatter(logging.Formatter):
     BOLD = '\033[1m'
     
     def __init__(self, fmt: Optional[str] = None, datefmt: Optional[str] = None):
+        # Pull the level name's width out of the format so it can be applied
+        # to the plain name; escape codes would throw off %-padding
+        width = 0
+        match = _LEVELNAME_FIELD.search(fmt) if fmt else None
+        if match:
+            width = int(match.group(1) or 0)
+            fmt = fmt.replace(match.group(0), '%(levelname)s')
         super().__init__(fmt, datefmt)
+        self._width = width
+        self._colored = {name: self._colorize(name) for name in self.COLORS}
+        self._time_cache = (-1, '')  # (whole second, formatted asctime)
+    
+    def _colorize(self, levelname: str) -> str:
+        color = self.COLORS.get(levelname, self.RESET)
+        padding = ' ' * max(abs(self._width) - len(levelname), 0)
+        colored = f"{color}{self.BOLD}{levelname}{self.RESET}"
+        return colored + padding if self._width < 0 else padding + colored
+    
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        # A datefmt has no sub-second field, so one strftime serves the
+        # whole second (without one, the default adds milliseconds)
+        if not datefmt:
+            return super().formatTime(record, datefmt)
+        sec = int(record.created)
+        cached_sec, asctime = self._time_cache
+        if cached_sec != sec:
+            asctime = super().formatTime(record, datefmt)
+            self._time_cache = (sec, asctime)
+        return asctime
     
     def format(self, record: logging.LogRecord) -> str:
-        # Get color for this level
-        color = self.COLORS.get(record.levelname, self.RESET)
-        
-        # Add correlation ID if available
-        corr_id = correlation_id.get()
-        if corr_id:
-            record.correlation_id = corr_id[:8]
-        else:
-            record.correlation_id = '--------'
-        
-        # Format the message
-        formatted = super().format(record)
-        
-        # Apply color to level name in the message
-        formatted = formatted.replace(
-            record.levelname,
-            f"{color}{self.BOLD}{record.levelname}{self.RESET}"
-        )
-        
-        return formatted
+        # Write the colored level name straight into the output
+        # (correlation ID is stamped by CorrelationFilter)
+        levelname = record.levelname
+        record.levelname = self._colored.get(levelname) or self._colorize(levelname)
+        try:
+            return super().format(record)
+        finally:
+            record.levelname = levelname
+
+
+# Attributes every LogRecord carries; anything else was passed via extra=
+_STD_RECORD_ATTRS = frozenset({
+    'name', 'msg', 'args', 'created', 'filename', 'funcName',
+    'levelname', 'levelno', 'lineno', 'module', 'msecs',
+    'pathname', 'process', 'processName', 'relativeCreated',
+    'thread', 'threadName', 'taskName', 'asctime',
+    'stack_info', 'exc_info', 'exc_text', 'message', 'correlation_id',
+    'short_correlation_id'
+})
+
+
+# Naive datetimes in extras are UTC (as the timestamp field is)
+_JSON_LOG_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
 
 
 class JsonFormatter(logging.Formatter):
@@ -68,31 +145,99 @@ class JsonFormatter(logging.Formatter):
     """
     
     def format(self, record: logging.LogRecord) -> str:
-        import json
-        
+        corr_id = getattr(record, 'correlation_id', NO_CORRELATION_ID)
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": (
+                time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+                + f".{int(record.msecs):03d}Z"
+            ),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
-            "correlation_id": correlation_id.get() or None,
+            "correlation_id": None if corr_id == NO_CORRELATION_ID else corr_id,
         }
         
-        # Add exception info if present
-        if record.exc_info:
+        # Add exception info if present (queued records carry it pre-formatted)
+        if record.exc_text:
+            log_entry["exception"] = record.exc_text
+        elif record.exc_info:
             log_entry["exception"] = self.formatException(record.exc_info)
         
-        # Add extra fields
-        for key, value in record.__dict__.items():
-            if key not in [
-                'name', 'msg', 'args', 'created', 'filename', 'funcName',
-                'levelname', 'levelno', 'lineno', 'module', 'msecs',
-                'pathname', 'process', 'processName', 'relativeCreated',
-                'stack_info', 'exc_info', 'exc_text', 'message', 'correlation_id'
-            ]:
-                log_entry[key] = value
+        # Add extra fields (usually none, so the set difference is empty)
+        for key in record.__dict__.keys() - _STD_RECORD_ATTRS:
+            log_entry[key] = record.__dict__[key]
         
-        return json.dumps(log_entry)
+        # Datetime and numpy extras serialize natively; default=str covers
+        # anything else that is not JSON-native
+        return orjson.dumps(log_entry, default=str, option=_JSON_LOG_OPTIONS).decode()
+
+
+# =============================================================================
+# ROTATING FILE HANDLER
+# =============================================================================
+
+class FastRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that remembers the file size after each write
+    instead of formatting every record and asking the filesystem up front.
+    The real check only runs once the file reaches 90% of maxBytes.
+    """
+    
+    def __init__(self, filename, *args, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        try:
+            self._size = os.path.getsize(self.baseFilename)
+        except OSError:
+            self._size = 0
+    
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.maxBytes <= 0 or self._size < self.maxBytes * 0.9:
+            return False
+        return bool(super().shouldRollover(record))
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        if self.stream is not None:
+            self._size = self.stream.tell()
+
+
+# =============================================================================
+# QUEUE HANDLER
+# =============================================================================
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread so callers never wait on disk.
+    ERROR and above always get through (blocking if the queue is full);
+    anything lower is dropped and counted when the queue is full.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._exc_formatter = logging.Formatter()
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the stock prepare, keep the traceback out of msg: formatters
+        # on the listener side get it as exc_text (text formats append it,
+        # JsonFormatter writes it under "exception")
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if record.levelno >= logging.ERROR:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
 
 # =============================================================================
@@ -108,6 +253,7 @@ def setup_logging(
 ) -> logging.Logger:
     """
     Configure the HyperOS logger with console and file handlers.
+    The handlers run on a listener thread; the root logger only enqueues.
     
     Args:
         level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
@@ -124,35 +270,40 @@ def setup_logging(
     root_logger.setLevel(getattr(logging, level.upper(), logging.INFO))
     
     # Clear any existing handlers
+    stop_logging()
+    for handler in root_logger.handlers:
+        handler.close()
     root_logger.handlers.clear()
     
     # Console format
     console_format = (
-        "%(asctime)s │ %(levelname)-8s │ [%(correlation_id)s] │ "
+        "%(asctime)s │ %(levelname)-8s │ [%(short_correlation_id)s] │ "
         "%(name)-20s │ %(message)s"
     )
     console_datefmt = "%H:%M:%S"
     
     # File format
     file_format = (
-        "%(asctime)s | %(levelname)-8s | %(correlation_id)s | "
+        "%(asctime)s | %(levelname)-8s | %(short_correlation_id)s | "
         "%(name)s | %(funcName)s:%(lineno)d | %(message)s"
     )
     file_datefmt = "%Y-%m-%d %H:%M:%S"
     
+    handlers = []
+    
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.DEBUG)
     console_formatter = ColoredFormatter(console_format, console_datefmt)
     console_handler.setFormatter(console_formatter)
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
     # File handler (if enabled)
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
         
-        file_handler = RotatingFileHandler(
+        file_handler = FastRotatingFileHandler(
             log_path,
             maxBytes=max_size_mb * 1024 * 1024,
             backupCount=backup_count,
@@ -165,7 +316,19 @@ def setup_logging(
         else:
             file_handler.setFormatter(logging.Formatter(file_format, file_datefmt))
         
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    # The queue handler runs on the caller's thread, so the correlation ID
+    # (a ContextVar) is read there. Handler filters see propagated records
+    # too, unlike logger filters.
+    queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(CorrelationFilter())
+    root_logger.addHandler(queue_handler)
+    
+    global _listener, _queue_handler
+    _queue_handler = queue_handler
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
     
     # Set levels for noisy libraries
     logging.getLogger("urllib3").setLevel(logging.WARNING)
@@ -176,6 +339,27 @@ def setup_logging(
     return root_logger
 
 
+def stop_logging() -> None:
+    """
+    Write out any queued records and stop the listener thread. The real
+    handlers go back on the root logger, so later records are still
+    written (synchronously) instead of piling up in a dead queue.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        root_logger = logging.getLogger()
+        root_logger.removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.addFilter(CorrelationFilter())
+            root_logger.addHandler(handler)
+        _listener = None
+        _queue_handler = None
+
+
+atexit.register(stop_logging)
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Get a logger instance with the given name.
@@ -189,6 +373,16 @@ def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(f"HyperOS.{name}")
 
 
+def new_correlation_id() -> str:
+    """
+    Generate a 32-hex-char correlation ID without a syscall: a random
+    per-process prefix plus a 48-bit counter, so IDs sort by creation order
+    within a process and don't collide across processes. Log lines show
+    only the tail (see CorrelationFilter).
+    """
+    return f"{_CORR_PREFIX}{next(_corr_counter):012x}"
+
+
 def set_correlation_id(corr_id: Optional[str] = None) -> str:
     """
     Set the correlation ID for the current context.
@@ -200,7 +394,7 @@ def set_correlation_id(corr_id: Optional[str] = None) -> str:
         The correlation ID set
     """
     if corr_id is None:
-        corr_id = str(uuid.uuid4())
+        corr_id = new_correlation_id()
     correlation_id.set(corr_id)
     return corr_id
 
@@ -225,7 +419,7 @@ class LogContext:
     """
     
     def __init__(self, correlation_id: Optional[str] = None):
-        self.correlation_id = correlation_id or str(uuid.uuid4())
+        self.correlation_id = correlation_id or new_correlation_id()
         self._token = None
     
     def __enter__(self) -> 'LogContext':
@@ -240,30 +434,40 @@ class LogContext:
 # CONVENIENCE FUNCTIONS
 # =============================================================================
 
+# The helpers below pass their fields as extra= as well, so JsonFormatter
+# emits them as structured keys; console lines keep the readable message
+
 def log_task_start(task: str, task_id: str) -> None:
     """Log task start with context"""
     logger = get_logger("Agent")
     set_correlation_id(task_id)
-    logger.info(f"Task started: {task[:100]}")
+    logger.info("Task started: %s", task[:100], extra={"task_id": task_id, "task": task[:100]})
 
 
 def log_task_end(task_id: str, status: str, steps: int) -> None:
     """Log task completion"""
     logger = get_logger("Agent")
-    logger.info(f"Task completed: status={status}, steps={steps}")
+    logger.info(
+        "Task completed: status=%s, steps=%s", status, steps,
+        extra={"task_id": task_id, "status": status, "steps": steps}
+    )
 
 
 def log_action(action: str, params: dict, result: str) -> None:
     """Log an action execution"""
     logger = get_logger("Action")
-    logger.debug(f"Execute: {action}({params}) -> {result}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Execute: %s(%s) -> %s", action, params, result,
+            extra={"action": action, "params": params, "result": result}
+        )
 
 
 def log_security_event(event_type: str, details: str, severity: str = "WARNING") -> None:
     """Log a security-related event"""
     logger = get_logger("Security")
     log_fn = getattr(logger, severity.lower(), logger.warning)
-    log_fn(f"[{event_type}] {details}")
+    log_fn("[%s] %s", event_type, details, extra={"event_type": event_type, "details": details})
 
 
 # Initialize default logging
@@ -3,17 +3,19 @@ HyperOS Agent Core - FastAPI Server
 Provides REST API for the Electron frontend to communicate with the agent
 """
 
+import asyncio
 import logging
 from typing import Optional
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 import uvicorn
 
-from agent import get_agent, HyperOSAgent
+from agent import get_agent
 
 # Configure logging
 logging.basicConfig(
@@ -22,6 +24,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger('HyperOSServer')
 
+# Runs agent tasks off the event loop; one slot, as the agent runs one task at a time
+_task_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hyperos-task")
+
 
 # Pydantic models for request/response validation
 class TaskRequest(BaseModel):
@@ -62,12 +67,14 @@ async def lifespan(app: FastAPI):
         agent = get_agent()
         logger.info("Agent initialized successfully")
     except Exception as e:
-        logger.error(f"Failed to initialize agent: {e}")
+        logger.error("Failed to initialize agent: %s", e)
         raise
     
     yield
     
     logger.info("Shutting down HyperOS Agent Core...")
+    agent.shutdown()
+    _task_executor.shutdown(wait=False)
 
 
 # Create FastAPI app
@@ -81,6 +88,8 @@ app = FastAPI(
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
+    # Starlette expects sequences and builds its own lookup sets; a list
+    # keeps the Access-Control-Allow-Methods header order stable
     allow_origins=[
         "http://localhost:5173",      # Vite dev server
         "http://127.0.0.1:5173",
@@ -98,7 +107,7 @@ app.add_middleware(
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Handle unexpected exceptions globally"""
-    logger.exception(f"Unhandled exception: {exc}")
+    logger.exception("Unhandled exception: %s", exc)
     return JSONResponse(
         status_code=500,
         content={
@@ -133,7 +142,7 @@ async def health_check() -> HealthResponse:
             system=system_status
         )
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -145,9 +154,10 @@ async def execute_task(request: TaskRequest) -> TaskResponse:
     This endpoint accepts a natural language task description and
     runs the Analyze-Plan-Execute loop to complete it.
     
-    Note: This is a blocking operation that may take several seconds.
+    Note: This may take several seconds; the task runs on a worker thread
+    so /status and /cancel stay responsive meanwhile.
     """
-    logger.info(f"Received task: {request.task}")
+    logger.info("Received task: %s", request.task)
     
     try:
         agent = get_agent()
@@ -159,8 +169,10 @@ async def execute_task(request: TaskRequest) -> TaskResponse:
                 detail="Another task is already in progress. Cancel it first or wait."
             )
         
-        # Execute the task (blocking)
-        result = agent.execute_instruction(request.task)
+        # Execute the task off the event loop
+        result = await asyncio.get_running_loop().run_in_executor(
+            _task_executor, agent.execute_instruction, request.task
+        )
         
         return TaskResponse(
             status=result.get("status", "error"),
@@ -172,10 +184,10 @@ async def execute_task(request: TaskRequest) -> TaskResponse:
     except HTTPException:
         raise
     except ValueError as e:
-        logger.error(f"Validation error: {e}")
+        logger.error("Validation error: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.exception(f"Task execution failed: {e}")
+        logger.exception("Task execution failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -209,7 +221,7 @@ async def cancel_task() -> CancelResponse:
             )
             
     except Exception as e:
-        logger.error(f"Cancel request failed: {e}")
+        logger.error("Cancel request failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -228,7 +240,7 @@ async def get_status():
             "system": agent.get_system_status()
         }
     except Exception as e:
-        logger.error(f"Status check failed: {e}")
+        logger.error("Status check failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
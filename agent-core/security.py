@@ -3,6 +3,7 @@ HyperOS Security Utilities
 Input validation, audit logging, rate limiting, and safety checks
 """
 
+import os
 import re
 import time
 import hashlib
@@ -10,12 +11,22 @@ import logging
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
+from array import array
 from collections import deque
-from functools import wraps
+from functools import wraps, lru_cache
 from dataclasses import dataclass
 import json
+import atexit
+import weakref
 import threading
 
+import orjson
+
+try:
+    import ahocorasick  # optional: pyahocorasick
+except ImportError:
+    ahocorasick = None
+
 logger = logging.getLogger('HyperOS.Security')
 
 
@@ -47,12 +58,32 @@ DANGEROUS_PATTERNS = [
     r"taskkill\s+/f",      # Force kill process
 ]
 
+# Each list is scanned in one pass. The keyword scan is a lookahead so that
+# keywords overlapping each other ("admin password", "password") all match.
+_BLOCKED_RE = re.compile(
+    "(?=(" + "|".join(re.escape(k) for k in BLOCKED_KEYWORDS) + "))",
+    re.IGNORECASE
+)
+_KEYWORD_ORDER = {keyword: i for i, keyword in enumerate(BLOCKED_KEYWORDS)}
+
+# With pyahocorasick installed, keywords are found by an automaton whose cost
+# does not grow with the keyword count; otherwise the regex above is used
+_KEYWORD_AUTOMATON = None
+if ahocorasick is not None:
+    _KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for _keyword in BLOCKED_KEYWORDS:
+        _KEYWORD_AUTOMATON.add_word(_keyword, _keyword)
+    _KEYWORD_AUTOMATON.make_automaton()
+_DANGEROUS_RE = re.compile("|".join(DANGEROUS_PATTERNS), re.IGNORECASE)
+_CTRL_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+_WS_RE = re.compile(r'\s+')
+
 
 # =============================================================================
 # INPUT VALIDATION
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class ValidationResult:
     """Result of input validation"""
     is_valid: bool
@@ -62,6 +93,35 @@ class ValidationResult:
     reason: Optional[str] = None
 
 
+@lru_cache(maxsize=1024)
+def _scan_task(sanitized: str) -> Tuple[Tuple[str, ...], Optional[str], str]:
+    """
+    Regex work for validate_task_input, memoized so a retried task is free.
+    
+    Returns:
+        Tuple of (blocked keywords in list order, dangerous match or None,
+        cleaned input)
+    """
+    # Check for blocked keywords (reported once each, in list order)
+    if _KEYWORD_AUTOMATON is not None:
+        hits = {keyword for _, keyword in _KEYWORD_AUTOMATON.iter(sanitized.lower())}
+    else:
+        hits = {match.group(1).lower() for match in _BLOCKED_RE.finditer(sanitized)}
+    keywords = tuple(sorted(hits, key=_KEYWORD_ORDER.__getitem__))
+    
+    # Check for dangerous patterns
+    match = _DANGEROUS_RE.search(sanitized)
+    dangerous = match.group() if match else None
+    
+    # Remove control characters
+    cleaned = _CTRL_RE.sub('', sanitized)
+    
+    # Limit consecutive whitespace
+    cleaned = _WS_RE.sub(' ', cleaned)
+    
+    return keywords, dangerous, cleaned
+
+
 def validate_task_input(task: str) -> ValidationResult:
     """
     Validate and sanitize user task input.
@@ -87,28 +147,16 @@ def validate_task_input(task: str) -> ValidationResult:
         )
     
     # Strip and limit length
-    sanitized = task.strip()[:1000]
-    
-    # Check for blocked keywords
-    task_lower = sanitized.lower()
-    for keyword in BLOCKED_KEYWORDS:
-        if keyword in task_lower:
-            warnings.append(f"Task contains sensitive keyword: '{keyword}'")
-            logger.warning(f"Sensitive keyword detected in task: {keyword}")
-    
-    # Check for dangerous patterns
-    for pattern in DANGEROUS_PATTERNS:
-        if re.search(pattern, sanitized, re.IGNORECASE):
-            blocked = True
-            reason = f"Task contains potentially dangerous command pattern"
-            logger.error(f"Dangerous pattern blocked: {pattern}")
-            break
+    keywords, dangerous, sanitized = _scan_task(task.strip()[:1000])
     
-    # Remove control characters
-    sanitized = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', sanitized)
+    for keyword in keywords:
+        warnings.append(f"Task contains sensitive keyword: '{keyword}'")
+        logger.warning(f"Sensitive keyword detected in task: {keyword}")
     
-    # Limit consecutive whitespace
-    sanitized = re.sub(r'\s+', ' ', sanitized)
+    if dangerous is not None:
+        blocked = True
+        reason = f"Task contains potentially dangerous command pattern"
+        logger.error(f"Dangerous pattern blocked: {dangerous}")
     
     return ValidationResult(
         is_valid=not blocked,
@@ -163,6 +211,12 @@ class CoordinateSafety:
                 "severity": "low"
             },
         ]
+        
+        # Flat per-zone tuples for the per-click check (no dict lookups)
+        self._zone_bounds: Tuple[Tuple[int, int, int, int, bool, str], ...] = tuple(
+            (z["x_min"], z["x_max"], z["y_min"], z["y_max"], z["severity"] == "high", z["name"])
+            for z in self.dangerous_zones
+        )
     
     def is_safe_coordinate(self, x: int, y: int) -> Tuple[bool, Optional[str]]:
         """
@@ -176,14 +230,12 @@ class CoordinateSafety:
             return False, f"Coordinates ({x}, {y}) are outside screen bounds"
         
         # Check dangerous zones
-        for zone in self.dangerous_zones:
-            if (zone["x_min"] <= x <= zone["x_max"] and 
-                zone["y_min"] <= y <= zone["y_max"]):
-                
-                if zone["severity"] == "high":
-                    return False, f"Clicking in dangerous zone: {zone['name']}"
+        for x_min, x_max, y_min, y_max, high, name in self._zone_bounds:
+            if x_min <= x <= x_max and y_min <= y <= y_max:
+                if high:
+                    return False, f"Clicking in dangerous zone: {name}"
                 else:
-                    logger.warning(f"Click near sensitive zone: {zone['name']} at ({x}, {y})")
+                    logger.warning(f"Click near sensitive zone: {name} at ({x}, {y})")
         
         return True, None
     
@@ -203,18 +255,74 @@ class CoordinateSafety:
 # AUDIT LOGGING
 # =============================================================================
 
+# Append-only, unbuffered; O_BINARY keeps Windows from translating newlines
+_AUDIT_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0)
+_IOV_MAX = 1024  # POSIX guarantees at least this many buffers per writev
+
+
+def _write_lines(fd: int, lines: List[bytes]) -> None:
+    """Append newline-terminated lines to fd without concatenating them first"""
+    if hasattr(os, "writev"):
+        iov: List[bytes] = []
+        for line in lines:
+            iov.append(line)
+            iov.append(b"\n")
+        for start in range(0, len(iov), _IOV_MAX):
+            os.writev(fd, iov[start:start + _IOV_MAX])
+    else:
+        # Windows has no writev
+        os.write(fd, b"\n".join(lines) + b"\n")
+
+
+# (second, ISO string of that second) shared by audit entries in the same second
+_TS_CACHE: Tuple[int, str] = (0, "")
+
+
+def _audit_timestamp() -> str:
+    """Local ISO timestamp with microseconds, formatting the date part once per second"""
+    global _TS_CACHE
+    now = time.time()
+    sec = int(now)
+    cached_sec, base = _TS_CACHE
+    if cached_sec != sec:
+        base = datetime.fromtimestamp(sec).isoformat()
+        _TS_CACHE = (sec, base)
+    return f"{base}.{int((now - sec) * 1e6):06d}"
+
+
 class AuditLogger:
     """
     Secure audit logging for all agent actions.
     Logs are written to a tamper-evident format.
+    Entries are chained and queued in order; a background thread appends
+    them in batches.
     """
     
+    FLUSH_RECORDS = 32       # Wake the writer once this many entries queue up
+    FLUSH_INTERVAL = 0.2     # Otherwise write whatever is queued this often (s)
+    
     def __init__(self, log_dir: str = "logs"):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
-        self.log_file = self.log_dir / f"audit_{datetime.now().strftime('%Y%m%d')}.jsonl"
+        self._day = datetime.now().strftime('%Y%m%d')
+        self.log_file = self.log_dir / f"audit_{self._day}.jsonl"
+        # Held open for the day; reopened on the first write after midnight
+        self._fd = os.open(self.log_file, _AUDIT_OPEN_FLAGS, 0o644)
         self.lock = threading.Lock()
         self._last_hash = ""
+        self._pending: deque = deque()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        # The writer only holds a weak reference, so an unused logger can be collected
+        self._writer = threading.Thread(
+            target=self._writer_loop,
+            args=(weakref.ref(self), self._wake, self.FLUSH_INTERVAL),
+            name="audit-writer",
+            daemon=True
+        )
+        self._writer.start()
+        _open_audit_loggers.add(self)
     
     def log_action(
         self,
@@ -238,25 +346,94 @@ class AuditLogger:
         safe_params = self._sanitize_params(parameters)
         
         entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _audit_timestamp(),
             "task_id": task_id,
             "action": action_type,
             "parameters": safe_params,
             "user_task": user_task[:100] if user_task else None,  # Truncate
             "result": result,
-            "prev_hash": self._last_hash,
         }
         
-        # Create hash chain for tamper evidence
-        entry_str = json.dumps(entry, sort_keys=True)
-        entry["hash"] = hashlib.sha256(entry_str.encode()).hexdigest()[:16]
-        self._last_hash = entry["hash"]
+        with self.lock:
+            if self._closed:
+                logger.warning("Audit logger is closed, dropping entry: %s", action_type)
+                return
+            
+            # Create hash chain for tamper evidence: each entry's hash covers
+            # the entry itself, including the previous entry's hash
+            entry["prev_hash"] = self._last_hash
+            serialized = orjson.dumps(entry, option=orjson.OPT_SORT_KEYS)
+            entry_hash = hashlib.sha256(serialized).hexdigest()[:16]
+            self._last_hash = entry_hash
+            # Written line is the hashed bytes with the hash appended as the last key
+            self._pending.append(serialized[:-1] + b',"hash":"' + entry_hash.encode() + b'"}')
+            backlog = len(self._pending)
+        
+        if backlog >= self.FLUSH_RECORDS:
+            self._wake.set()
         
+        logger.debug(f"Audit logged: {action_type} [{entry_hash}]")
+    
+    @staticmethod
+    def _writer_loop(ref: "weakref.ref[AuditLogger]", wake: threading.Event, interval: float) -> None:
+        """Append queued entries every interval or when a batch fills, until closed"""
+        while True:
+            wake.wait(interval)
+            wake.clear()
+            audit = ref()
+            if audit is None or audit._closed:
+                return
+            try:
+                audit.flush()
+            except Exception as e:
+                logger.error(f"Audit log write failed: {e}")
+            del audit
+    
+    def flush(self) -> None:
+        """Write every queued entry to the audit file, in order"""
+        with self._io_lock:
+            if self._fd is not None:
+                self._flush_locked()
+    
+    def _flush_locked(self) -> None:
+        """flush() body; the caller holds _io_lock and the file is open"""
         with self.lock:
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(entry) + "\n")
+            if not self._pending:
+                return
+            batch = list(self._pending)
+            self._pending.clear()
+        
+        day = datetime.now().strftime('%Y%m%d')
+        if day != self._day:
+            os.close(self._fd)
+            self._day = day
+            self.log_file = self.log_dir / f"audit_{day}.jsonl"
+            self._fd = os.open(self.log_file, _AUDIT_OPEN_FLAGS, 0o644)
         
-        logger.debug(f"Audit logged: {action_type} [{entry['hash']}]")
+        _write_lines(self._fd, batch)
+    
+    def close(self) -> None:
+        """Write out queued entries and close the audit file; later calls do nothing"""
+        with self._io_lock:
+            if self._fd is None:
+                return
+            # No new entries from here on, then drain what is already queued
+            with self.lock:
+                self._closed = True
+            try:
+                self._flush_locked()
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        _open_audit_loggers.discard(self)
+        self._wake.set()  # let the writer thread exit
+    
+    def __del__(self) -> None:
+        # Collected without close(): still write out what was queued
+        try:
+            self.close()
+        except Exception:
+            pass
     
     def _sanitize_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Remove or redact sensitive information from parameters"""
@@ -275,6 +452,7 @@ class AuditLogger:
     
     def get_recent_entries(self, count: int = 50) -> List[Dict[str, Any]]:
         """Read recent audit entries"""
+        self.flush()
         entries = []
         try:
             with open(self.log_file, "r", encoding="utf-8") as f:
@@ -287,6 +465,19 @@ class AuditLogger:
         return entries[-count:]
 
 
+# Loggers still open; closed (and flushed) at interpreter exit. Weak, so
+# registering doesn't keep a logger alive.
+_open_audit_loggers: "weakref.WeakSet[AuditLogger]" = weakref.WeakSet()
+
+
+def _close_audit_loggers() -> None:
+    for audit in list(_open_audit_loggers):
+        audit.close()
+
+
+atexit.register(_close_audit_loggers)
+
+
 # =============================================================================
 # RATE LIMITER
 # =============================================================================
@@ -300,7 +491,10 @@ class RateLimiter:
     def __init__(self, max_requests: int = 10, window_seconds: int = 60):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests: deque = deque()
+        # Ring of the last max_requests accepted times (time.monotonic());
+        # the slot at _head is the oldest, i.e. the one a new request replaces
+        self._ring = array('d', [float('-inf')] * max(max_requests, 0))
+        self._head = 0
         self.lock = threading.Lock()
     
     def is_allowed(self) -> Tuple[bool, Optional[int]]:
@@ -310,35 +504,30 @@ class RateLimiter:
         Returns:
             Tuple of (is_allowed, seconds_until_allowed)
         """
-        now = time.time()
-        window_start = now - self.window_seconds
+        if self.max_requests <= 0:
+            # A zero budget allows nothing
+            return False, self.window_seconds
+        
+        now = time.monotonic()
         
         with self.lock:
-            # Remove old entries
-            while self.requests and self.requests[0] < window_start:
-                self.requests.popleft()
-            
-            if len(self.requests) >= self.max_requests:
+            oldest = self._ring[self._head]
+            if now - oldest <= self.window_seconds:
                 # Calculate wait time
-                oldest = self.requests[0]
                 wait_time = int(oldest + self.window_seconds - now) + 1
                 return False, wait_time
             
             # Allow request
-            self.requests.append(now)
+            self._ring[self._head] = now
+            self._head = (self._head + 1) % self.max_requests
             return True, None
     
     def get_remaining(self) -> int:
         """Get remaining requests in current window"""
-        now = time.time()
-        window_start = now - self.window_seconds
-        
+        window_start = time.monotonic() - self.window_seconds
         with self.lock:
-            # Remove old entries
-            while self.requests and self.requests[0] < window_start:
-                self.requests.popleft()
-            
-            return max(0, self.max_requests - len(self.requests))
+            used = sum(1 for t in self._ring if t >= window_start)
+        return max(0, self.max_requests - used)
 
 
 # =============================================================================
@@ -359,6 +548,9 @@ class SensitiveDataDetector:
         "api_key": r'\b[A-Za-z0-9_-]{32,}\b',
     }
     
+    # All patterns in one pass; the named group that matched is the type
+    _UNION_RE = re.compile("|".join(f"(?P<{k}>{v})" for k, v in PATTERNS.items()))
+    
     @classmethod
     def detect(cls, text: str) -> List[Dict[str, str]]:
         """
@@ -369,30 +561,28 @@ class SensitiveDataDetector:
         """
         detections = []
         
-        for data_type, pattern in cls.PATTERNS.items():
-            matches = re.findall(pattern, text)
-            for match in matches:
-                # Mask the value
-                if len(match) > 8:
-                    masked = match[:4] + "*" * (len(match) - 8) + match[-4:]
-                else:
-                    masked = "*" * len(match)
-                
-                detections.append({
-                    "type": data_type,
-                    "masked_value": masked,
-                    "warning": f"Detected {data_type.replace('_', ' ')} in content"
-                })
+        for m in cls._UNION_RE.finditer(text):
+            data_type = m.lastgroup
+            match = m.group()
+            
+            # Mask the value
+            if len(match) > 8:
+                masked = match[:4] + "*" * (len(match) - 8) + match[-4:]
+            else:
+                masked = "*" * len(match)
+            
+            detections.append({
+                "type": data_type,
+                "masked_value": masked,
+                "warning": f"Detected {data_type.replace('_', ' ')} in content"
+            })
         
         return detections
     
     @classmethod
     def contains_sensitive(cls, text: str) -> bool:
         """Quick check if text contains any sensitive patterns"""
-        for pattern in cls.PATTERNS.values():
-            if re.search(pattern, text):
-                return True
-        return False
+        return cls._UNION_RE.search(text) is not None
 
 
 # =============================================================================
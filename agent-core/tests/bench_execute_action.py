@@ -0,0 +1,50 @@
+"""
+Micro-benchmark for HyperOSAgent.execute_action dispatch
+Input calls are mocked, so this times only the per-step dispatch overhead.
+
+Run from agent-core:  python -m tests.bench_execute_action
+"""
+
+import os
+import timeit
+from unittest.mock import patch
+
+# (action, parameters) - one entry per handler
+CASES = [
+    ('click', {'x': 1, 'y': 1}),
+    ('type', {'text': 'hello'}),
+    ('press_key', {'key': 'enter'}),
+    ('press_key', {'key': 'ctrl+c'}),
+    ('wait', {'seconds': 0}),
+    ('done', {'reason': 'bench'}),
+    ('unknown_action', {}),
+]
+
+NUMBER = 20000
+
+
+def main() -> None:
+    with patch.dict(os.environ, {"GEMINI_API_KEY": "bench_key_1234567890"}), \
+            patch('agent.genai'), patch('agent.pyautogui') as mock_pyautogui, \
+            patch('agent.time.sleep'):
+        mock_pyautogui.size.return_value = (1920, 1080)
+
+        from agent import HyperOSAgent
+        agent = HyperOSAgent()
+        agent._warmed.wait(timeout=5)  # keep the warm-up out of the timings
+
+        try:
+            for action, params in CASES:
+                # Best of 5 runs, so one-off scheduler noise doesn't count
+                best = min(timeit.repeat(
+                    lambda: agent.execute_action(action, params),
+                    number=NUMBER,
+                    repeat=5
+                ))
+                print(f"{action:<15} {str(params):<22} {best / NUMBER * 1e6:8.2f} us/call")
+        finally:
+            agent.shutdown()
+
+
+if __name__ == '__main__':
+    main()
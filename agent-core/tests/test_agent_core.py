@@ -5,35 +5,69 @@ Tests the main agent functionality with mocked dependencies
 
 import unittest
 from unittest.mock import MagicMock, patch, PropertyMock
-import sys
 import os
 import json
+import threading
 
-# Add parent directory to path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Imported once here; tests patch attributes on the module, not the import
+from PIL import Image
+from agent import HyperOSAgent, AgentResponse, ActionResult, ActionType, _EarlyActionParser
 
 
 class TestHyperOSAgent(unittest.TestCase):
     """Test cases for the HyperOSAgent class"""
     
-    @patch('agent.genai')
-    @patch('agent.pyautogui')
-    def setUp(self, mock_pyautogui, mock_genai):
-        """Set up test fixtures"""
-        self.env_patcher = patch.dict(os.environ, {"GEMINI_API_KEY": "test_key_1234567890"})
-        self.env_patcher.start()
+    @classmethod
+    def setUpClass(cls):
+        """Build one agent for the whole class - construction is the slow part"""
+        cls._patchers = [
+            patch.dict(os.environ, {"GEMINI_API_KEY": "test_key_1234567890"}),
+            patch('agent.genai'),
+            patch('agent.pyautogui'),
+        ]
+        _, _, mock_pyautogui = [patcher.start() for patcher in cls._patchers]
         
         mock_pyautogui.size.return_value = (1920, 1080)
         mock_pyautogui.PAUSE = 0.5
         mock_pyautogui.FAILSAFE = True
         
-        from agent import HyperOSAgent
-        self.agent = HyperOSAgent()
-        self.mock_pyautogui = mock_pyautogui
-
-    def tearDown(self):
-        self.env_patcher.stop()
-
+        cls.agent = HyperOSAgent()
+        cls.agent._warmed.wait(timeout=5)  # keep the warm-up out of the tests' patches
+        cls._model = cls.agent.model
+        cls.mock_pyautogui = mock_pyautogui
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.agent.shutdown()
+        for patcher in reversed(cls._patchers):
+            patcher.stop()
+    
+    def setUp(self):
+        """Reset the per-task state tests touch on the shared agent"""
+        agent = self.agent
+        agent.model = self._model
+        agent.current_task = None
+        agent.history = []
+        agent._history_json.clear()
+        agent.is_running = False
+        agent._cancel_event.clear()
+        agent._capture_local = threading.local()
+        agent._image_scale = 1.0
+        agent._image_offset = (0, 0)
+        agent._pred_cache.clear()
+        agent._last_frame_hash = None
+        agent._last_exact_hash = None
+        agent._same_frame_count = 0
+        agent._drain_thread = None
+        self.mock_pyautogui.reset_mock()
+        
+        # No test needs real wall-clock waits; the ones asserting on sleep
+        # or the settle step patch them again themselves
+        for target in ('agent.time.sleep', 'agent.HyperOSAgent._wait_for_ui_settle'):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
     def test_agent_initialization(self):
         """Test that agent initializes with correct properties"""
         self.assertEqual(self.agent.os_type, os.name == 'nt' and 'Windows' or self.agent.os_type)
@@ -51,26 +85,80 @@ class TestHyperOSAgent(unittest.TestCase):
         self.assertIn('is_running', status)
         self.assertEqual(status['screen_resolution'], '1920x1080')
     
-    @patch('agent.pyautogui.screenshot')
-    def test_capture_screen(self, mock_screenshot):
-        """Test screen capture calls pyautogui"""
+    @patch('agent.Image.frombytes')
+    @patch('agent.mss.mss')
+    def test_capture_screen(self, mock_mss, mock_frombytes):
+        """Test screen capture grabs the primary monitor through mss"""
+        mock_sct = mock_mss.return_value
+        mock_sct.monitors = [{"left": 0}, {"left": 0, "top": 0, "width": 1920, "height": 1080}]
+        mock_raw = mock_sct.grab.return_value
+        mock_raw.size = (16, 8)
+        mock_raw.width, mock_raw.height = 16, 8
+        mock_raw.raw = bytes(16 * 8 * 4)
         mock_image = MagicMock()
-        mock_image.size = (1920, 1080)
-        mock_screenshot.return_value = mock_image
+        mock_image.size = (16, 8)
+        mock_image.info = {}
+        mock_frombytes.return_value = mock_image
         
         result = self.agent.capture_screen()
         
-        mock_screenshot.assert_called_once()
+        mock_sct.grab.assert_called_once_with(mock_sct.monitors[1])
+        mock_frombytes.assert_called_once_with("RGB", (16, 8), mock_raw.bgra, "raw", "BGRX")
         self.assertEqual(result, mock_image)
+        self.assertIn("frame_hash", result.info)
+    
+    @patch('agent.Image.frombytes')
+    @patch('agent.mss.mss')
+    def test_capture_screen_reuses_grabber(self, mock_mss, mock_frombytes):
+        """Test the mss grabber is created once and reused"""
+        mock_mss.return_value.monitors = [{}, {}]
+        mock_raw = mock_mss.return_value.grab.return_value
+        mock_raw.width, mock_raw.height = 16, 8
+        mock_raw.raw = bytes(16 * 8 * 4)
+        mock_frombytes.return_value.info = {}
+        
+        self.agent.capture_screen()
+        self.agent.capture_screen()
+        
+        mock_mss.assert_called_once()
+    
+    # (action, parameters, patched target, expected call args, expected call kwargs)
+    ACTION_CASES = [
+        ('click', {'x': 500, 'y': 300}, 'agent.pyautogui.click', (500, 300), {}),
+        ('type', {'text': 'Hello World'}, 'agent.pyautogui.write', ('Hello World',), {'interval': 0.05}),
+        ('press_key', {'key': 'enter'}, 'agent.pyautogui.press', ('enter',), {}),
+        ('press_key', {'key': 'ctrl+c'}, 'agent.pyautogui.hotkey', ('ctrl', 'c'), {}),
+        ('wait', {'seconds': 2}, 'agent.time.sleep', (2,), {}),
+        ('wait', {'seconds': 100}, 'agent.time.sleep', (10.0,), {}),  # capped at 10 seconds
+    ]
+    
+    def test_execute_action_cases(self):
+        """Test each action drives the expected input call"""
+        for action, params, target, args, kwargs in self.ACTION_CASES:
+            with self.subTest(action=action, params=params), patch(target) as mock_call:
+                result = self.agent.execute_action(action, params)
+                
+                mock_call.assert_called_with(*args, **kwargs)
+                self.assertTrue(result.success)
+                self.assertEqual(result.action_type, action)
+    
+    @patch('agent.pyautogui.click')
+    def test_execute_action_click_scales_to_screen(self, mock_click):
+        """Test click coordinates on a downscaled screenshot map back to the screen"""
+        self.agent._image_scale = 1.5
+        result = self.agent.execute_action('click', {'x': 640, 'y': 360})
+        
+        mock_click.assert_called_with(960, 540)
+        self.assertTrue(result.success)
     
     @patch('agent.pyautogui.click')
-    def test_execute_action_click(self, mock_click):
-        """Test click action execution"""
-        result = self.agent.execute_action('click', {'x': 500, 'y': 300})
+    def test_execute_action_click_offsets_cropped_window(self, mock_click):
+        """Test click coordinates on a window crop are translated by the crop origin"""
+        self.agent._image_offset = (200, 100)
+        result = self.agent.execute_action('click', {'x': 50, 'y': 40})
         
-        mock_click.assert_called_with(500, 300)
+        mock_click.assert_called_with(250, 140)
         self.assertTrue(result.success)
-        self.assertEqual(result.action_type, 'click')
     
     @patch('agent.pyautogui.click')
     def test_execute_action_click_invalid_coords(self, mock_click):
@@ -81,15 +169,6 @@ class TestHyperOSAgent(unittest.TestCase):
         self.assertFalse(result.success)
         self.assertIn('outside screen bounds', result.error)
     
-    @patch('agent.pyautogui.write')
-    def test_execute_action_type(self, mock_write):
-        """Test typing action execution"""
-        result = self.agent.execute_action('type', {'text': 'Hello World'})
-        
-        mock_write.assert_called_with('Hello World', interval=0.05)
-        self.assertTrue(result.success)
-        self.assertEqual(result.action_type, 'type')
-    
     @patch('agent.pyautogui.click')
     @patch('agent.pyautogui.write')
     def test_execute_action_type_with_coords(self, mock_write, mock_click):
@@ -104,37 +183,11 @@ class TestHyperOSAgent(unittest.TestCase):
         mock_write.assert_called()
         self.assertTrue(result.success)
     
-    @patch('agent.pyautogui.press')
-    def test_execute_action_press_key(self, mock_press):
-        """Test key press action"""
-        result = self.agent.execute_action('press_key', {'key': 'enter'})
-        
-        mock_press.assert_called_with('enter')
-        self.assertTrue(result.success)
-    
-    @patch('agent.pyautogui.hotkey')
-    def test_execute_action_press_key_combo(self, mock_hotkey):
-        """Test key combination action"""
-        result = self.agent.execute_action('press_key', {'key': 'ctrl+c'})
-        
-        mock_hotkey.assert_called_with('ctrl', 'c')
-        self.assertTrue(result.success)
-    
-    @patch('agent.time.sleep')
-    def test_execute_action_wait(self, mock_sleep):
-        """Test wait action"""
-        result = self.agent.execute_action('wait', {'seconds': 2})
-        
-        mock_sleep.assert_called_with(2)
-        self.assertTrue(result.success)
-    
-    @patch('agent.time.sleep')
-    def test_execute_action_wait_capped(self, mock_sleep):
-        """Test wait action is capped at 10 seconds"""
-        result = self.agent.execute_action('wait', {'seconds': 100})
-        
-        mock_sleep.assert_called_with(10.0)
-        self.assertTrue(result.success)
+    def test_every_action_type_has_a_handler(self):
+        """Test the dispatch table covers every ActionType"""
+        for action in ActionType:
+            with self.subTest(action=action.value):
+                self.assertIn(action.value, self.agent._action_handlers)
     
     def test_execute_action_done(self):
         """Test done action"""
@@ -150,6 +203,24 @@ class TestHyperOSAgent(unittest.TestCase):
         self.assertFalse(result.success)
         self.assertIn('not recognized', result.error)
     
+    def test_prompt_history_omits_thinking(self):
+        """Test prompt history records keep the action but drop the model's reasoning"""
+        step_record = {
+            "step": 1,
+            "thinking": "long reasoning " * 50,
+            "action": "click",
+            "parameters": {"x": 1, "y": 2},
+            "done": False
+        }
+        
+        self.agent._record_result(step_record, ActionResult(True, 'click', 'Clicked'))
+        
+        slim = json.loads(self.agent._history_json[-1])
+        self.assertNotIn('thinking', slim)
+        self.assertEqual(slim['action'], 'click')
+        self.assertTrue(slim['result_success'])
+        self.assertIn('thinking', step_record)
+    
     def test_request_cancel_when_not_running(self):
         """Test cancel request when no task is running"""
         result = self.agent.request_cancel()
@@ -160,14 +231,104 @@ class TestHyperOSAgent(unittest.TestCase):
         self.agent.is_running = True
         result = self.agent.request_cancel()
         self.assertTrue(result)
-        self.assertTrue(self.agent._cancel_requested)
+        self.assertTrue(self.agent._cancel_event.is_set())
+    
+    def _mock_gemini_reply(self, payload):
+        """Make the mocked Gemini model answer with the given JSON payload"""
+        self.agent.model = MagicMock()
+        self.agent.model.generate_content.return_value = [MagicMock(text=json.dumps(payload))]
+    
+    @patch('agent.HyperOSAgent._get_active_window_title', return_value="Desktop")
+    def test_analyze_reuses_cached_decision(self, _mock_title):
+        """Test an unchanged screen for the same task skips the Gemini call"""
+        self._mock_gemini_reply({"thinking": "t", "action": "click", "parameters": {"x": 1, "y": 2}, "done": False})
+        
+        first = self.agent.ai_model_analyze_plan_execute("Open menu", Image.new("RGB", (64, 64)))
+        second = self.agent.ai_model_analyze_plan_execute("Open menu", Image.new("RGB", (64, 64)))
+        
+        self.assertEqual(self.agent.model.generate_content.call_count, 1)
+        self.assertEqual(first, second)
+    
+    @patch('agent.HyperOSAgent._get_active_window_title', return_value="Desktop")
+    def test_analyze_waits_when_screen_unchanged_after_action(self, _mock_title):
+        """Test an unrepainted screen after an action waits without calling Gemini"""
+        self._mock_gemini_reply({"thinking": "t", "action": "click", "parameters": {"x": 1, "y": 2}, "done": False})
+        
+        self.agent.ai_model_analyze_plan_execute("Open menu", Image.new("RGB", (64, 64)))
+        self.agent.history = [{"step": 1, "action": "click"}]
+        response = self.agent.ai_model_analyze_plan_execute("Open menu", Image.new("RGB", (64, 64)))
+        
+        self.assertEqual(response.action, 'wait')
+        self.assertEqual(self.agent.model.generate_content.call_count, 1)
+    
+    @patch('agent.HyperOSAgent._get_active_window_title', return_value="Desktop")
+    @patch('agent.mss.mss')
+    def test_captured_small_repaint_asks_again(self, mock_mss, _mock_title):
+        """Test a one-pixel repaint between real captures calls Gemini again"""
+        self._mock_gemini_reply({"thinking": "t", "action": "type", "parameters": {"text": "hi"}, "done": False})
+        width, height = 32, 16
+        before = bytearray(width * height * 4)
+        after = bytearray(before)
+        after[(1 * width + 1) * 4 + 1] = 255  # pixel (1, 1) - off any 8-pixel sampling grid
+        
+        def grab_returning(buffer):
+            raw = MagicMock(width=width, height=height, size=(width, height))
+            raw.raw = raw.bgra = bytes(buffer)
+            return raw
+        
+        mock_mss.return_value.monitors = [{}, {}]
+        mock_mss.return_value.grab.side_effect = [grab_returning(before), grab_returning(after)]
+        
+        self.agent.ai_model_analyze_plan_execute("Write hi", self.agent.capture_screen())
+        self.agent.history = [{"step": 1, "action": "type"}]
+        self.agent.ai_model_analyze_plan_execute("Write hi", self.agent.capture_screen())
+        
+        self.assertEqual(self.agent.model.generate_content.call_count, 2)
+    
+    @patch('agent.HyperOSAgent._get_active_window_title', return_value="Desktop")
+    def test_cached_decision_is_a_copy(self, _mock_title):
+        """Test a cache hit returns its own object, not the one handed out before"""
+        self._mock_gemini_reply({"thinking": "t", "action": "click", "parameters": {"x": 1, "y": 2}, "done": False})
+        
+        first = self.agent.ai_model_analyze_plan_execute("Open menu", Image.new("RGB", (64, 64)))
+        first.parameters["x"] = 999
+        second = self.agent.ai_model_analyze_plan_execute("Open menu", Image.new("RGB", (64, 64)))
+        
+        self.assertIsNot(first, second)
+        self.assertEqual(second.parameters["x"], 1)
+    
+    @patch('agent.HyperOSAgent._get_active_window_title', return_value="Desktop")
+    def test_analyze_asks_again_after_small_repaint(self, _mock_title):
+        """Test a slightly changed screen after a type action calls Gemini again"""
+        self._mock_gemini_reply({"thinking": "t", "action": "type", "parameters": {"text": "hi"}, "done": False})
+        
+        before = Image.new("RGB", (64, 64))
+        self.agent.ai_model_analyze_plan_execute("Write hi", before)
+        self.agent.history = [{"step": 1, "action": "type"}]
+        
+        # A few typed characters - too small to move the coarse frame hash
+        after = before.copy()
+        after.paste((255, 255, 255), (10, 10, 14, 12))
+        self.agent.ai_model_analyze_plan_execute("Write hi", after)
+        
+        self.assertEqual(self.agent.model.generate_content.call_count, 2)
+    
+    @patch('agent.HyperOSAgent._get_active_window_title', return_value="Desktop")
+    def test_analyze_forces_wait_on_stalled_screen(self, _mock_title):
+        """Test the same frame seen repeatedly forces a wait action"""
+        self._mock_gemini_reply({"thinking": "t", "action": "click", "parameters": {"x": 1, "y": 2}, "done": False})
+        
+        responses = [
+            self.agent.ai_model_analyze_plan_execute("Open menu", Image.new("RGB", (64, 64)))
+            for _ in range(self.agent.STALL_FRAME_LIMIT)
+        ]
+        
+        self.assertEqual(responses[-1].action, 'wait')
     
     @patch('agent.HyperOSAgent.capture_screen')
     @patch('agent.HyperOSAgent.ai_model_analyze_plan_execute')
     def test_run_task_completes_on_done(self, mock_analyze, mock_capture):
         """Test run_task completes when AI returns done"""
-        from agent import AgentResponse
-        
         mock_capture.return_value = MagicMock()
         mock_analyze.return_value = AgentResponse(
             thinking="Task analysis",
@@ -187,8 +348,6 @@ class TestHyperOSAgent(unittest.TestCase):
     @patch('agent.time.sleep')
     def test_run_task_executes_multiple_steps(self, mock_sleep, mock_execute, mock_analyze, mock_capture):
         """Test run_task executes multiple steps"""
-        from agent import AgentResponse, ActionResult
-        
         mock_capture.return_value = MagicMock()
         mock_execute.return_value = ActionResult(True, 'click', 'Clicked')
         
@@ -214,6 +373,41 @@ class TestHyperOSAgent(unittest.TestCase):
         self.assertEqual(len(result['history']), 2)
         self.assertEqual(mock_analyze.call_count, 2)
     
+    @patch('agent.HyperOSAgent.capture_screen')
+    @patch('agent.HyperOSAgent.ai_model_analyze_plan_execute')
+    @patch('agent.HyperOSAgent.execute_action')
+    @patch('agent.HyperOSAgent._wait_for_ui_settle')
+    def test_run_task_executes_multi_action_turn(self, mock_settle, mock_execute, mock_analyze, mock_capture):
+        """Test a multi-action response runs every action before asking Gemini again"""
+        mock_capture.return_value = MagicMock()
+        mock_execute.return_value = ActionResult(True, 'type', 'Typed')
+        mock_analyze.side_effect = [
+            AgentResponse(
+                thinking="Type and submit",
+                action="type",
+                parameters={"text": "hello"},
+                done=False,
+                actions=[
+                    {"action": "type", "parameters": {"text": "hello"}},
+                    {"action": "press_key", "parameters": {"key": "enter"}}
+                ]
+            ),
+            AgentResponse(
+                thinking="Done now",
+                action="done",
+                parameters={"reason": "Finished"},
+                done=True
+            )
+        ]
+        
+        result = self.agent.run_task("Search for hello")
+        
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(mock_analyze.call_count, 2)
+        self.assertEqual(mock_execute.call_count, 2)
+        mock_execute.assert_any_call("press_key", {"key": "enter"})
+        self.assertEqual(len(result['history']), 3)
+    
     @patch('agent.HyperOSAgent.capture_screen')
     @patch('agent.HyperOSAgent.ai_model_analyze_plan_execute')
     def test_run_task_handles_ai_failure(self, mock_analyze, mock_capture):
@@ -238,6 +432,38 @@ class TestHyperOSAgent(unittest.TestCase):
         self.assertIn('already running', result['message'])
 
 
+class TestEarlyActionParser(unittest.TestCase):
+    """Test the streamed-response parser returns only runnable actions"""
+    
+    def _feed(self, chunks):
+        parser = _EarlyActionParser()
+        for chunk in chunks:
+            data = parser.feed(chunk)
+            if data is not None:
+                return data
+        return None
+    
+    def test_waits_for_parameters_after_done(self):
+        """Test parameters sent after done are not dropped"""
+        data = self._feed([
+            '{"action": "click", ',
+            '"done": false, ',
+            '"parameters": {"x": 5, ',
+            '"y": 7}, ',
+            '"thinking": "long'
+        ])
+        self.assertEqual(data["parameters"], {"x": 5, "y": 7})
+    
+    def test_parameterless_action_returns_early(self):
+        """Test a wait with done needs no parameters to return"""
+        data = self._feed(['{"action": "wait", "done": false, ', '"thinking": "..."}'])
+        self.assertEqual(data["action"], "wait")
+    
+    def test_incomplete_action_is_not_returned(self):
+        """Test a click without parameters never returns early"""
+        self.assertIsNone(self._feed(['{"action": "click", "done": false, ', '"thinking": "t"']))
+
+
 class TestAgentApiKeyValidation(unittest.TestCase):
     """Test API key validation"""
     
@@ -251,8 +477,6 @@ class TestAgentApiKeyValidation(unittest.TestCase):
         if 'GEMINI_API_KEY' in os.environ:
             del os.environ['GEMINI_API_KEY']
         
-        from agent import HyperOSAgent
-        
         with self.assertRaises(ValueError) as context:
             HyperOSAgent()
         
@@ -1,13 +1,8 @@
 
 import unittest
 from unittest.mock import MagicMock, patch
-import time
 from datetime import datetime
-import sys
-import os
-
-# Add parent directory to path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tempfile
 
 from error_recovery import (
     retry_with_backoff,
@@ -18,8 +13,33 @@ from error_recovery import (
     FallbackActions
 )
 
+class FakeClock:
+    """Monotonic clock the test advances by hand"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+
 class TestErrorRecovery(unittest.TestCase):
     
+    def setUp(self):
+        # Backoff delays are computed but never actually slept
+        sleep_patcher = patch('error_recovery.time.sleep')
+        self.mock_sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+    
+    def _checkpoint_dir(self):
+        """Fresh per-test checkpoint directory, removed after the test"""
+        tmp = tempfile.TemporaryDirectory(prefix="hyperos_ckpt_")
+        self.addCleanup(tmp.cleanup)
+        return tmp.name
+    
     def test_retry_with_backoff_success(self):
         mock_func = MagicMock(return_value="success")
         
@@ -41,6 +61,7 @@ class TestErrorRecovery(unittest.TestCase):
         result = decorated_func()
         self.assertEqual(result, "success")
         self.assertEqual(mock_func.call_count, 2)
+        self.mock_sleep.assert_called_once()
 
     def test_retry_with_backoff_max_retries_exceeded(self):
         mock_func = MagicMock(side_effect=ValueError("fail"))
@@ -55,7 +76,8 @@ class TestErrorRecovery(unittest.TestCase):
         self.assertEqual(mock_func.call_count, 3) # Initial + 2 retries
 
     def test_circuit_breaker_flow(self):
-        cb = CircuitBreaker(failure_threshold=2, recovery_timeout=0.1, name="test_cb")
+        clock = FakeClock()
+        cb = CircuitBreaker(failure_threshold=2, recovery_timeout=0.1, name="test_cb", clock=clock)
         
         self.assertTrue(cb.is_closed)
         
@@ -75,8 +97,13 @@ class TestErrorRecovery(unittest.TestCase):
         with self.assertRaises(CircuitOpenError):
              cb.call(MagicMock(return_value="should not run"))
 
-        # Wait for recovery timeout
-        time.sleep(0.2)
+        # Still inside the recovery timeout
+        clock.advance(0.05)
+        with self.assertRaises(CircuitOpenError):
+            cb.call(MagicMock(return_value="should not run"))
+        
+        # Move past the recovery timeout instead of sleeping
+        clock.advance(0.1)
         
         # Next call should be allowed (half-open)
         mock_success = MagicMock(return_value="success")
@@ -94,12 +121,9 @@ class TestErrorRecovery(unittest.TestCase):
         self.assertTrue(cb.is_closed)
 
     def test_checkpoint_manager(self):
-        cm = CheckpointManager(checkpoint_dir="test_checkpoints")
+        cm = CheckpointManager(checkpoint_dir=self._checkpoint_dir())
+        self.addCleanup(cm.flush)
         
-        # clean up before test
-        for p in cm.checkpoint_dir.glob("*.json"):
-            p.unlink()
-            
         # Save checkpoint
         cp_id = cm.save_checkpoint(
             task_id="task1",
@@ -111,17 +135,42 @@ class TestErrorRecovery(unittest.TestCase):
         
         self.assertIsNotNone(cp_id)
         
+        # The write happens in the background; flush waits for it
+        cm.flush()
+        self.assertTrue((cm.checkpoint_dir / f"{cp_id}.json").exists())
+        
         # Restore checkpoint
         cp = cm.restore_checkpoint(cp_id)
         self.assertIsNotNone(cp)
         self.assertEqual(cp.task_id, "task1")
         self.assertEqual(cp.step_number, 1)
         self.assertEqual(cp.metadata["key"], "value")
+        self.assertIsInstance(cp.timestamp, datetime)
         
         # Clean up
         removed = cm.cleanup_old_checkpoints(max_age_hours=0) # remove all
         # self.assertGreaterEqual(removed, 1) # Might fail if too fast, but good enough
 
+    def test_get_latest_checkpoint(self):
+        checkpoint_dir = self._checkpoint_dir()
+        cm = CheckpointManager(checkpoint_dir=checkpoint_dir)
+        self.addCleanup(cm.flush)
+        
+        cm.save_checkpoint("task2", 1, "test task", [{"action": "click"}])
+        cm.save_checkpoint("task2", 2, "test task", [{"action": "type"}])
+        
+        # Served from the index written by save_checkpoint
+        cp = cm.get_latest_checkpoint("task2")
+        self.assertEqual(cp.step_number, 2)
+        
+        # A fresh manager has no index and falls back to scanning the directory
+        cp = CheckpointManager(checkpoint_dir=checkpoint_dir).get_latest_checkpoint("task2")
+        self.assertEqual(cp.step_number, 2)
+        
+        cm.cleanup_old_checkpoints(max_age_hours=0)
+        self.assertNotIn("task2", cm._latest)
+        self.assertIsNone(cm.get_latest_checkpoint("task2"))
+
     def test_fallback_actions(self):
         action = FallbackActions.get_safe_action()
         self.assertEqual(action["action"], "wait")
@@ -136,6 +185,19 @@ class TestErrorRecovery(unittest.TestCase):
         self.assertEqual(action["action"], "wait")
         self.assertEqual(action["parameters"]["seconds"], 10)
         
+        # Each call gets its own dict - editing one doesn't leak into the next
+        action["parameters"]["seconds"] = 0
+        action = FallbackActions.handle_ai_failure(Exception("429 Resource exhausted"), 0)
+        self.assertEqual(action["parameters"]["seconds"], 10)
+        
+        # Categories keep their priority however the message is worded
+        action = FallbackActions.handle_ai_failure(Exception("Authentication failed: quota exhausted"), 0)
+        self.assertEqual(action["action"], "wait")
+        action = FallbackActions.handle_ai_failure(Exception("503 upstream, rate limited"), 0)
+        self.assertEqual(action["action"], "wait")
+        action = FallbackActions.handle_ai_failure(Exception("Invalid key"), 0)
+        self.assertIn("authentication", action["parameters"]["reason"])
+        
         # Retry
         action = FallbackActions.handle_ai_failure(Exception("Random error"), 0, max_retries=2)
         self.assertEqual(action["action"], "wait") # Retry action is a wait
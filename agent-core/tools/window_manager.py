@@ -3,14 +3,64 @@ HyperOS Window Manager - Utilities for window detection and control
 Uses pygetwindow for cross-platform window management
 """
 
+import os
+import time
 import logging
-from typing import Optional, List, Dict, Any
+import threading
+from typing import Optional, List, Dict, Any, Tuple
 
 import pygetwindow as gw
 
 logger = logging.getLogger('WindowManager')
 
 
+class _WindowCache:
+    """
+    Short-lived snapshot of gw.getAllWindows().
+    Enumerating windows walks every top-level window in the OS, so lookups
+    within ttl seconds of each other share one enumeration.
+    """
+    
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._refreshed_at = float("-inf")
+        self.windows: List[gw.Window] = []
+        self.titles: List[str] = []
+        # Lowercased titles, parallel to windows, for case-insensitive matching
+        self.titles_lower: List[str] = []
+        # Lowercased exact title -> first window with that title
+        self.title_index: Dict[str, gw.Window] = {}
+        # Memoized get_window_bounds results for this snapshot
+        self.bounds: Dict[str, Optional[Dict[str, int]]] = {}
+    
+    def get(self) -> "_WindowCache":
+        """Return the snapshot, re-enumerating if it is older than ttl"""
+        with self._lock:
+            if time.monotonic() - self._refreshed_at >= self.ttl:
+                windows = gw.getAllWindows()
+                titles = [window.title or "" for window in windows]
+                titles_lower = [title.lower() for title in titles]
+                title_index: Dict[str, gw.Window] = {}
+                for title_lower, window in zip(titles_lower, windows):
+                    title_index.setdefault(title_lower, window)
+                
+                self.windows, self.titles = windows, titles
+                self.titles_lower = titles_lower
+                self.title_index = title_index
+                self.bounds = {}
+                self._refreshed_at = time.monotonic()
+        return self
+    
+    def invalidate(self) -> None:
+        """Force the next lookup to re-enumerate (after changing a window)"""
+        with self._lock:
+            self._refreshed_at = float("-inf")
+
+
+_window_cache = _WindowCache(float(os.getenv("HYPEROS_WINDOW_CACHE_TTL", "0.25")))
+
+
 class WindowManager:
     """
     Static utility class for window management operations.
@@ -34,6 +84,23 @@ class WindowManager:
             logger.warning(f"Failed to get active window: {e}")
             return "Unknown"
     
+    @staticmethod
+    def get_active_window_rect() -> Optional[Tuple[int, int, int, int]]:
+        """
+        Get the bounding rectangle of the currently active window.
+        
+        Returns:
+            (left, top, width, height), or None if detection fails
+        """
+        try:
+            active_window = gw.getActiveWindow()
+            if active_window and active_window.width > 0 and active_window.height > 0:
+                return (active_window.left, active_window.top, active_window.width, active_window.height)
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to get active window rect: {e}")
+            return None
+    
     @staticmethod
     def find_window_by_title(title_query: str) -> Optional[gw.Window]:
         """
@@ -46,21 +113,26 @@ class WindowManager:
             First matching Window object, or None if not found
         """
         try:
-            # Get all windows with matching title
-            windows = gw.getWindowsWithTitle(title_query)
+            cache = _window_cache.get()
+            query_lower = title_query.lower()
             
-            if windows:
-                logger.debug(f"Found {len(windows)} windows matching '{title_query}'")
-                return windows[0]
+            # Exact title (any case) is a single dict probe
+            window = cache.title_index.get(query_lower)
+            if window is not None:
+                return window
             
-            # Try case-insensitive search
-            all_windows = gw.getAllWindows()
-            for window in all_windows:
-                if title_query.lower() in window.title.lower():
+            # One pass: prefer a case-sensitive substring match, else the
+            # first case-insensitive one
+            fallback = None
+            for title, title_lower, window in zip(cache.titles, cache.titles_lower, cache.windows):
+                if title_query in title:
                     return window
+                if fallback is None and query_lower in title_lower:
+                    fallback = window
             
-            logger.debug(f"No windows found matching '{title_query}'")
-            return None
+            if fallback is None:
+                logger.debug(f"No windows found matching '{title_query}'")
+            return fallback
             
         except Exception as e:
             logger.error(f"Error finding window '{title_query}': {e}")
@@ -87,6 +159,7 @@ class WindowManager:
                 
                 # Activate (bring to front and focus)
                 window.activate()
+                _window_cache.invalidate()
                 logger.info(f"Focused window: {window.title}")
                 return True
             
@@ -106,29 +179,47 @@ class WindowManager:
             List of dictionaries containing window information
         """
         try:
-            all_windows = gw.getAllWindows()
-            window_list = []
+            cache = _window_cache.get()
+            # One foreground-window query for the whole listing instead of
+            # one isActive round-trip per window
+            active = gw.getActiveWindow()
             
-            for window in all_windows:
+            # Columns are filled in one pass; each property on a window is an
+            # OS call, so the rect is read once via box rather than four times
+            titles, boxes, flags = [], [], []
+            for title, window in zip(cache.titles, cache.windows):
                 # Skip windows with empty titles (usually system windows)
-                if not window.title or not window.title.strip():
+                if not title.strip():
                     continue
                 
+                titles.append(title)
                 try:
-                    window_info = {
-                        "title": window.title,
-                        "left": window.left,
-                        "top": window.top,
-                        "width": window.width,
-                        "height": window.height,
-                        "is_active": window.isActive,
-                        "is_minimized": window.isMinimized,
-                        "is_maximized": window.isMaximized
-                    }
-                    window_list.append(window_info)
+                    boxes.append(window.box)
+                    flags.append((
+                        active is not None and window == active,
+                        window.isMinimized,
+                        window.isMaximized
+                    ))
                 except Exception:
                     # Some window properties may not be accessible
-                    window_list.append({"title": window.title})
+                    boxes.append(None)
+                    flags.append(None)
+            
+            window_list = []
+            for title, box, flag in zip(titles, boxes, flags):
+                if box is None:
+                    window_list.append({"title": title})
+                    continue
+                window_list.append({
+                    "title": title,
+                    "left": box.left,
+                    "top": box.top,
+                    "width": box.width,
+                    "height": box.height,
+                    "is_active": flag[0],
+                    "is_minimized": flag[1],
+                    "is_maximized": flag[2]
+                })
             
             logger.debug(f"Found {len(window_list)} windows")
             return window_list
@@ -149,19 +240,27 @@ class WindowManager:
             Dictionary with left, top, width, height, or None if not found
         """
         try:
+            cache = _window_cache.get()
+            if window_title in cache.bounds:
+                return cache.bounds[window_title]
+            
             window = WindowManager.find_window_by_title(window_title)
             
+            bounds = None
             if window:
-                return {
-                    "left": window.left,
-                    "top": window.top,
-                    "width": window.width,
-                    "height": window.height,
-                    "right": window.left + window.width,
-                    "bottom": window.top + window.height
+                # box reads the window rect once instead of once per field
+                box = window.box
+                bounds = {
+                    "left": box.left,
+                    "top": box.top,
+                    "width": box.width,
+                    "height": box.height,
+                    "right": box.left + box.width,
+                    "bottom": box.top + box.height
                 }
             
-            return None
+            cache.bounds[window_title] = bounds
+            return bounds
             
         except Exception as e:
             logger.error(f"Error getting window bounds: {e}")
@@ -182,6 +281,7 @@ class WindowManager:
             window = WindowManager.find_window_by_title(window_title)
             if window:
                 window.minimize()
+                _window_cache.invalidate()
                 return True
             return False
         except Exception as e:
@@ -203,6 +303,7 @@ class WindowManager:
             window = WindowManager.find_window_by_title(window_title)
             if window:
                 window.maximize()
+                _window_cache.invalidate()
                 return True
             return False
         except Exception as e:
@@ -1,28 +1,142 @@
 import urllib.request
+import urllib.error
 import zipfile
+import hashlib
+import shutil
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-url = "https://github.com/electron/electron/releases/download/v28.3.3/electron-v28.3.3-win32-x64.zip"
-dest = "electron_binary.zip"
+version = "28.3.3"
+zip_name = f"electron-v{version}-win32-x64.zip"
+release_url = f"https://github.com/electron/electron/releases/download/v{version}"
+url = f"{release_url}/{zip_name}"
 extract_path = "node_modules/electron/dist"
 
-print(f"Downloading Electron from {url}...")
+# Downloads are cached by version outside the checkout, so re-running the
+# script (or another checkout) reuses the archive instead of fetching 100 MB
+cache_dir = os.environ.get(
+    "HYPEROS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "hyperos")
+)
+cache_zip = os.path.join(cache_dir, zip_name)
+CHUNK_SIZE = 1024 * 1024
+EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def installed_version():
+    """Version of the Electron already extracted, if any"""
+    try:
+        with open(os.path.join(extract_path, "version")) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def expected_sha256():
+    """SHA-256 of the archive, from the release's published SHASUMS256.txt"""
+    with urllib.request.urlopen(f"{release_url}/SHASUMS256.txt") as response:
+        for line in response.read().decode().splitlines():
+            digest, _, name = line.partition(" ")
+            if name.lstrip("*") == zip_name:
+                return digest
+    raise ValueError(f"{zip_name} not listed in SHASUMS256.txt")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download(dest):
+    """Download to dest, resuming a previous partial download with a Range request"""
+    part = dest + ".part"
+    have = os.path.getsize(part) if os.path.exists(part) else 0
+
+    request = urllib.request.Request(url)
+    if have:
+        print(f"Resuming download at {have / (1024 * 1024):.1f} MB...")
+        request.add_header("Range", f"bytes={have}-")
+
+    try:
+        with urllib.request.urlopen(request) as response:
+            # 200 means the server ignored the range - start over
+            mode = "ab" if response.status == 206 else "wb"
+            with open(part, mode) as f:
+                shutil.copyfileobj(response, f, CHUNK_SIZE)
+    except urllib.error.HTTPError as e:
+        # 416: nothing left to fetch, the partial file is already complete
+        if e.code != 416:
+            raise
+
+    os.replace(part, dest)
+
+
+def extract_members(archive, names):
+    # Each worker opens its own handle - a ZipFile can't be read from
+    # several threads at once, but zlib inflates outside the GIL
+    with zipfile.ZipFile(archive, 'r') as zip_ref:
+        for name in names:
+            zip_ref.extract(name, extract_path)
+
+
+def extract_parallel(archive):
+    """Extract the archive with its files spread across EXTRACT_WORKERS threads"""
+    with zipfile.ZipFile(archive, 'r') as zip_ref:
+        members = zip_ref.infolist()
+
+    # Create the directory tree up front so workers never race on makedirs
+    files = []
+    for member in members:
+        if member.is_dir():
+            os.makedirs(os.path.join(extract_path, member.filename), exist_ok=True)
+        elif member.filename != "version":
+            os.makedirs(os.path.dirname(os.path.join(extract_path, member.filename)), exist_ok=True)
+            files.append(member)
+
+    # Deal the largest files out first so the workers finish together
+    files.sort(key=lambda member: member.file_size, reverse=True)
+    batches = [[member.filename for member in files[i::EXTRACT_WORKERS]] for i in range(EXTRACT_WORKERS)]
+
+    with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
+        # list() re-raises the first extraction error, if any
+        list(executor.map(extract_members, [archive] * len(batches), batches))
+
+    # The version file marks a complete install, so it only lands once
+    # everything else has been extracted
+    if any(member.filename == "version" for member in members):
+        extract_members(archive, ["version"])
+
+
+if installed_version() == version:
+    print(f"Electron {version} is already extracted to {extract_path}. Nothing to do.")
+    sys.exit(0)
+
 try:
-    urllib.request.urlretrieve(url, dest)
-    print("Download complete.")
-    
+    os.makedirs(cache_dir, exist_ok=True)
+
+    if os.path.exists(cache_zip):
+        print(f"Using cached {cache_zip}")
+    else:
+        print(f"Downloading Electron from {url}...")
+        download(cache_zip)
+        print("Download complete.")
+
+    print("Verifying checksum...")
+    if file_sha256(cache_zip) != expected_sha256():
+        os.remove(cache_zip)
+        raise ValueError("Checksum mismatch - removed the cached archive, please re-run")
+
     if not os.path.exists(extract_path):
         os.makedirs(extract_path)
-        
+
     print(f"Extracting to {extract_path}...")
-    with zipfile.ZipFile(dest, 'r') as zip_ref:
-        zip_ref.extractall(extract_path)
-    
-    # Cleanup
-    os.remove(dest)
+    extract_parallel(cache_zip)
+
     print("Extraction successful. Electron binary is ready.")
-    
+
 except Exception as e:
     print(f"Error: {e}")
     sys.exit(1)
@@ -3,11 +3,14 @@ from tkinter import ttk
 import threading
 import pyautogui
 import pygetwindow as gw
+import pyperclip
 from PIL import Image, ImageTk, ImageGrab
 import time
-import keyboard
 import os
+import sys
+import ctypes
 import subprocess
+import shutil
 import json
 from datetime import datetime
 
@@ -23,8 +26,79 @@ class VisionSystem:
 
     @staticmethod
     def locate_window(name):
-        wins = gw.getWindowsWithTitle(name)
-        return wins[0] if wins else None
+        now = time.monotonic()
+        ts, cached = _WIN_CACHE.get(name, (0, None))
+        if cached is not None and now - ts < WIN_CACHE_TTL:
+            return cached
+
+        # The focused window is the usual target - check it before enumerating every HWND
+        try:
+            active = gw.getActiveWindow()
+        except:
+            active = None
+        if active is not None and name.upper() in active.title.upper():
+            win = active
+        else:
+            wins = gw.getWindowsWithTitle(name)
+            win = wins[0] if wins else None
+
+        if win is not None:
+            _WIN_CACHE[name] = (now, win)
+        return win
+
+# TYPE actions longer than this go through the clipboard
+PASTE_THRESHOLD = 20
+PASTE_SETTLE = 0.1
+
+# locate_window results, keyed by title: name -> (monotonic timestamp, window)
+_WIN_CACHE = {}
+WIN_CACHE_TTL = 0.25
+
+# App tokens from "start <app>" commands -> executables, launched without a shell
+_APP_TABLE = {
+    "notepad": "notepad.exe",
+    "calc": "calc.exe",
+    "chrome": shutil.which("chrome") or "chrome",
+}
+
+def _plan_notepad(log, task, t):
+    log("💡 STRATEGY: Resource 'Notepad' required. Orchestrating launch and text injection sequence.")
+    return [
+        {"type": "LOG", "msg": "Strategic Goal: Initialize Notepad and deploy content."},
+        {"type": "EXEC", "cmd": "start notepad", "desc": "Triggering system process: notepad.exe"},
+        {"type": "WAIT", "sec": 2, "desc": "Synchronizing with application lifecycle..."},
+        {"type": "VISION", "target": "Notepad", "desc": "Vision Verification: Locating software interface"},
+        {"type": "TYPE", "text": t.split("type")[-1] if "type" in t else "Hello World from HyperOS", "desc": "Autonomous Data Entry: Typing sequence active"}
+    ]
+
+def _plan_calc(log, task, t):
+    log("💡 STRATEGY: Mathematical engine requested. Path: System Calculator.")
+    return [
+        {"type": "LOG", "msg": "Strategic Goal: Compute values via native app."},
+        {"type": "EXEC", "cmd": "start calc", "desc": "Spawning Calculator process..."},
+        {"type": "WAIT", "sec": 1.5},
+        {"type": "VISION", "target": "Calculator", "desc": "Vision Focus: Locking on calculator UI"}
+    ]
+
+def _plan_browser(log, task, t):
+    log("💡 LOGIC: Browser request. Strategy: Launch default web client + navigation.")
+    return [
+        {"type": "EXEC", "cmd": "start chrome", "desc": "Booting Google Chrome..."},
+        {"type": "WAIT", "sec": 3},
+        {"type": "TYPE", "text": "https://google.com\n", "desc": "Automating URI navigation"}
+    ]
+
+def _plan_fallback(log, task, t):
+    log(f"💡 LOGIC: Complex task detected. Using heuristic execution for '{task}'")
+    return [{"type": "EXEC", "cmd": f"start {task}", "desc": f"Attempting to launch {task}"}]
+
+# Checked in order - the first keyword found in the task wins, as before
+_HANDLERS = {
+    "notepad": _plan_notepad,
+    "calc": _plan_calc,
+    "chrome": _plan_browser,
+    "google": _plan_browser,
+}
 
 class AgentBrain:
     def __init__(self, log_fn):
@@ -32,43 +106,15 @@ class AgentBrain:
 
     def create_plan(self, task):
         self.log("👁️ VISION: Scanning desktop surface...")
-        time.sleep(0.8)
         active_window = VisionSystem.identify_active_window()
         self.log(f"🧠 CONTEXT: Current focus is '{active_window}'.")
         
         self.log(f"🧠 ANALYZING TASK: '{task}'")
-        time.sleep(1.0)
         
         t = task.lower()
-        plan = []
-
-        if "notepad" in t:
-            self.log("💡 STRATEGY: Resource 'Notepad' required. Orchestrating launch and text injection sequence.")
-            plan = [
-                {"type": "LOG", "msg": "Strategic Goal: Initialize Notepad and deploy content."},
-                {"type": "EXEC", "cmd": "start notepad", "desc": "Triggering system process: notepad.exe"},
-                {"type": "WAIT", "sec": 2, "desc": "Synchronizing with application lifecycle..."},
-                {"type": "VISION", "target": "Notepad", "desc": "Vision Verification: Locating software interface"},
-                {"type": "TYPE", "text": t.split("type")[-1] if "type" in t else "Hello World from HyperOS", "desc": "Autonomous Data Entry: Typing sequence active"}
-            ]
-        elif "calc" in t:
-            self.log("💡 STRATEGY: Mathematical engine requested. Path: System Calculator.")
-            plan = [
-                {"type": "LOG", "msg": "Strategic Goal: Compute values via native app."},
-                {"type": "EXEC", "cmd": "start calc", "desc": "Spawning Calculator process..."},
-                {"type": "WAIT", "sec": 1.5},
-                {"type": "VISION", "target": "Calculator", "desc": "Vision Focus: Locking on calculator UI"}
-            ]
-        elif "chrome" in t or "google" in t:
-            self.log("💡 LOGIC: Browser request. Strategy: Launch default web client + navigation.")
-            plan = [
-                {"type": "EXEC", "cmd": "start chrome", "desc": "Booting Google Chrome..."},
-                {"type": "WAIT", "sec": 3},
-                {"type": "TYPE", "text": "https://google.com\n", "desc": "Automating URI navigation"}
-            ]
-        else:
-            self.log(f"💡 LOGIC: Complex task detected. Using heuristic execution for '{task}'")
-            plan = [{"type": "EXEC", "cmd": f"start {task}", "desc": f"Attempting to launch {task}"}]
+        key = next((k for k in _HANDLERS if k in t), None)
+        handler = _HANDLERS[key] if key else _plan_fallback
+        plan = handler(self.log, task, t)
 
         self.log(f"📋 STRATEGIC PLAN READY ({len(plan)} Actions)")
         return plan
@@ -86,14 +132,23 @@ class ActionEngine:
             self.log(f"▶️ RUNNING: {desc}")
 
         if atype == "EXEC":
-            # Direct execution for common apps
-            cmd = action['cmd']
-            if "notepad" in cmd.lower():
-                subprocess.Popen(['notepad.exe'])
-            elif "calc" in cmd.lower():
-                subprocess.Popen(['calc.exe'])
-            else:
-                subprocess.Popen(cmd, shell=True)
+            # Direct execution - no cmd.exe/sh in between
+            parts = action['cmd'].split()
+            if parts and parts[0].lower() == "start":
+                parts = parts[1:]
+            token = parts[0].lower() if parts else ""
+            args = parts[1:]
+            exe = _APP_TABLE.get(token) or shutil.which(token) or token
+            try:
+                subprocess.Popen([exe, *args], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.DEVNULL, close_fds=True)
+            except OSError:
+                if hasattr(os, "startfile"):
+                    # Apps registered under App Paths (e.g. chrome) aren't on PATH
+                    try: os.startfile(token, "open", subprocess.list2cmdline(args))
+                    except OSError: self.log(f"⚠️ EXEC WARNING: Could not launch '{token}'")
+                else:
+                    self.log(f"⚠️ EXEC WARNING: Could not launch '{token}'")
         elif atype == "WAIT":
             time.sleep(action['sec'])
         elif atype == "VISION":
@@ -111,24 +166,117 @@ class ActionEngine:
             else:
                 self.log(f"⚠️ VISION WARNING: Could not find '{action['target']}'")
         elif atype == "TYPE":
-            pyautogui.write(action['text'], interval=0.08)
+            text = action['text']
+            if len(text) > PASTE_THRESHOLD:
+                # Paste long text in one go instead of one keystroke pair per character
+                body = text.rstrip("\n")
+                saved = pyperclip.paste()
+                try:
+                    pyperclip.copy(body)
+                    pyautogui.hotkey('ctrl', 'v')
+                    # Give the target app a moment to read the clipboard before it is restored
+                    time.sleep(PASTE_SETTLE)
+                finally:
+                    pyperclip.copy(saved)
+                for _ in range(len(text) - len(body)):
+                    pyautogui.press('enter')
+            else:
+                pyautogui.write(text, interval=0.02)
         elif atype == "LOG":
             self.log(f"📄 STATUS: {action['msg']}")
 
+class HotkeyHook:
+    """
+    Global Ctrl+Space via a WH_KEYBOARD_LL hook. The OS calls the hook on
+    keydown, so there is no polling thread. The hook and its message pump
+    live on a daemon thread; the callback must hand off to Tk itself.
+    """
+    WH_KEYBOARD_LL = 13
+    WM_KEYDOWN = 0x0100
+    WM_SYSKEYDOWN = 0x0104
+    VK_SPACE = 0x20
+    VK_CONTROL = 0x11
+
+    def __init__(self, callback):
+        self.callback = callback
+        self._proc = None  # ctypes frees the hook callback unless we hold it
+
+    def start(self):
+        if sys.platform != "win32":
+            import keyboard
+            keyboard.add_hotkey('ctrl+space', self.callback)
+            return
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _pump(self):
+        from ctypes import wintypes
+
+        user32 = ctypes.WinDLL('user32', use_last_error=True)
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        LRESULT = ctypes.c_ssize_t
+        HOOKPROC = ctypes.WINFUNCTYPE(LRESULT, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
+
+        class KBDLLHOOKSTRUCT(ctypes.Structure):
+            _fields_ = [
+                ("vkCode", wintypes.DWORD),
+                ("scanCode", wintypes.DWORD),
+                ("flags", wintypes.DWORD),
+                ("time", wintypes.DWORD),
+                ("dwExtraInfo", ctypes.c_size_t),
+            ]
+
+        user32.SetWindowsHookExW.argtypes = (ctypes.c_int, HOOKPROC, wintypes.HINSTANCE, wintypes.DWORD)
+        user32.SetWindowsHookExW.restype = wintypes.HHOOK
+        user32.CallNextHookEx.argtypes = (wintypes.HHOOK, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
+        user32.CallNextHookEx.restype = LRESULT
+        user32.GetAsyncKeyState.restype = ctypes.c_short
+        kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+
+        def proc(n_code, w_param, l_param):
+            if n_code == 0 and w_param in (self.WM_KEYDOWN, self.WM_SYSKEYDOWN):
+                kb = ctypes.cast(l_param, ctypes.POINTER(KBDLLHOOKSTRUCT)).contents
+                if kb.vkCode == self.VK_SPACE and user32.GetAsyncKeyState(self.VK_CONTROL) & 0x8000:
+                    self.callback()
+            return user32.CallNextHookEx(None, n_code, w_param, l_param)
+
+        self._proc = HOOKPROC(proc)
+        hook = user32.SetWindowsHookExW(self.WH_KEYBOARD_LL, self._proc, kernel32.GetModuleHandleW(None), 0)
+        if not hook:
+            print(f"⚠️ Hotkey hook failed (error {ctypes.get_last_error()})")
+            return
+
+        # Low-level hooks are delivered through this thread's message loop
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        user32.UnhookWindowsHookEx(hook)
+
 class HyperOSApp:
+    GLOW_WIDTH = 8
+    MARK_SECONDS = 4
+
     def __init__(self):
         self.root = tk.Tk()
         self.root.withdraw()
         sw, sh = self.root.winfo_screenwidth(), self.root.winfo_screenheight()
 
-        # Global Overlay
-        self.overlay = tk.Toplevel(self.root)
-        self.overlay.overrideredirect(True)
-        self.overlay.attributes('-alpha', 0.8, '-topmost', True, '-transparentcolor', 'black')
-        self.overlay.geometry(f"{sw}x{sh}+0+0")
-        self.canvas = tk.Canvas(self.overlay, bg='black', highlightthickness=0)
-        self.canvas.pack(fill='both', expand=True)
-        self.glow = self.canvas.create_rectangle(15, 15, sw-15, sh-15, outline='#0080FF', width=30, state='hidden')
+        # Task glow: four thin edge windows instead of a full-screen transparent overlay,
+        # so showing/hiding it only repaints the border strips
+        g = self.GLOW_WIDTH
+        self._glow_edges = []
+        for geometry in (f"{sw}x{g}+0+0", f"{sw}x{g}+0+{sh-g}", f"{g}x{sh}+0+0", f"{g}x{sh}+{sw-g}+0"):
+            edge = tk.Toplevel(self.root)
+            edge.overrideredirect(True)
+            edge.attributes('-alpha', 0.8, '-topmost', True)
+            edge.configure(bg='#0080FF')
+            edge.geometry(geometry)
+            edge.withdraw()
+            self._glow_edges.append(edge)
+        self._glow_on = False
+
+        # Vision highlights: small per-annotation windows, reused across VISION steps
+        self._overlay_pool = []
 
         # Chat Overlay
         self.chat = tk.Toplevel(self.root)
@@ -139,10 +287,16 @@ class HyperOSApp:
         self.frame = tk.Frame(self.chat, bg='#020617', highlightbackground='#0080FF', highlightthickness=2)
         self.frame.pack(fill='both', expand=True)
 
+        # Log lines are buffered and flushed to the Text widget at most every 50ms
+        self._log_buf = []
+        self._log_pending = False
+        self._log_lock = threading.Lock()
+
         self.setup_ui()
         self.chat.bind('<Button-1>', self.start_drag)
         self.chat.bind('<B1-Motion>', self.do_drag)
-        keyboard.add_hotkey('ctrl+space', self.toggle)
+        self.hotkey = HotkeyHook(lambda: self.root.after_idle(self.toggle))
+        self.hotkey.start()
 
         self.brain = AgentBrain(self.log)
         self.engine = ActionEngine(self.log, self.mark_ui)
@@ -161,40 +315,89 @@ class HyperOSApp:
         self.entry.focus_set()
 
     def log(self, text):
+        with self._log_lock:
+            self._log_buf.append(f"{text}\n\n")
+            if self._log_pending:
+                return
+            self._log_pending = True
+        self.root.after(50, self._flush_log)
+
+    def _flush_log(self):
+        with self._log_lock:
+            joined = "".join(self._log_buf)
+            self._log_buf.clear()
+            self._log_pending = False
         self.history.config(state='normal')
-        self.history.insert('end', f"{text}\n\n")
+        self.history.insert('end', joined)
         self.history.config(state='disabled')
         self.history.see('end')
 
     def mark_ui(self, x, y, w, h, label):
-        self.canvas.create_rectangle(x, y, x+w, y+h, outline='#0080FF', width=4, tags='vision')
-        self.canvas.create_text(x, y-20, text=label, fill='#0080FF', font=('Arial', 10, 'bold'), anchor='nw', tags='vision')
-        self.root.after(4000, lambda: self.canvas.delete('vision'))
+        # Called from the worker thread - build the window on the Tk thread
+        self.root.after(0, self._show_mark, x, y, w, h, label)
+
+    def _show_mark(self, x, y, w, h, label):
+        win = self._overlay_pool.pop() if self._overlay_pool else self._new_mark_window()
+        canvas = win.mark_canvas
+        canvas.delete('all')
+        # Window spans the rect plus room above it for the label
+        win.geometry(f"{w+8}x{h+28}+{x-4}+{y-24}")
+        canvas.create_rectangle(4, 24, 4+w, 24+h, outline='#0080FF', width=4)
+        canvas.create_text(4, 4, text=label, fill='#0080FF', font=('Arial', 10, 'bold'), anchor='nw')
+        win.deiconify()
+        self.root.after(self.MARK_SECONDS * 1000, self._release_mark, win)
+
+    def _new_mark_window(self):
+        win = tk.Toplevel(self.root)
+        win.overrideredirect(True)
+        win.attributes('-alpha', 0.8, '-topmost', True, '-transparentcolor', 'black')
+        win.mark_canvas = tk.Canvas(win, bg='black', highlightthickness=0)
+        win.mark_canvas.pack(fill='both', expand=True)
+        return win
+
+    def _release_mark(self, win):
+        win.withdraw()
+        self._overlay_pool.append(win)
+
+    def set_glow(self, on):
+        self.root.after(0, self._apply_glow, on)
+
+    def _apply_glow(self, on):
+        self._glow_on = on
+        for edge in self._glow_edges:
+            if on and self.chat.winfo_viewable():
+                edge.deiconify()
+            else:
+                edge.withdraw()
 
     def on_task(self, e=None):
         task = self.entry.get().strip()
         if not task: return
         self.entry.delete(0, 'end')
         self.log(f"User Request: {task}")
-        self.canvas.itemconfigure(self.glow, state='normal')
+        self.set_glow(True)
         
         def run_thread():
             plan = self.brain.create_plan(task)
             for action in plan:
+                # No fixed pause between steps - the plan has explicit WAIT steps
                 self.engine.execute_action(action)
-                time.sleep(0.4)
             self.log("🏁 AGENT: Task completed successfully.")
-            self.canvas.itemconfigure(self.glow, state='hidden')
+            self.set_glow(False)
 
         threading.Thread(target=run_thread, daemon=True).start()
 
     def toggle(self):
+        _WIN_CACHE.clear()
         if self.chat.winfo_viewable():
             self.chat.withdraw()
-            self.overlay.withdraw()
+            for edge in self._glow_edges:
+                edge.withdraw()
         else:
             self.chat.deiconify()
-            self.overlay.deiconify()
+            if self._glow_on:
+                for edge in self._glow_edges:
+                    edge.deiconify()
             self.chat.lift()
 
     def start_drag(self, e):